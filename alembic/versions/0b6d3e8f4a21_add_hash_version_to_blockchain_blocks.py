@@ -0,0 +1,29 @@
+"""add hash_version to BlockchainBlocks
+
+Revision ID: 0b6d3e8f4a21
+Revises: f1c83d7e5a92
+Create Date: 2026-10-18 18:10:26.448753
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6d3e8f4a21'
+down_revision: Union[str, Sequence[str], None] = 'f1c83d7e5a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Все существующие блоки захешированы через json.dumps — это версия 0
+    op.add_column('BlockchainBlocks', sa.Column('hash_version', sa.SmallInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('BlockchainBlocks', 'hash_version')
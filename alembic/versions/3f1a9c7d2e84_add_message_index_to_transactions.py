@@ -0,0 +1,30 @@
+"""add message_index to BlockchainTransactions
+
+Revision ID: 3f1a9c7d2e84
+Revises: 5247a574d0dd
+Create Date: 2026-10-18 14:05:12.381904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a9c7d2e84'
+down_revision: Union[str, Sequence[str], None] = '5247a574d0dd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # До появления block producer каждый блок содержал ровно одно сообщение,
+    # поэтому для существующих транзакций message_index = 0.
+    op.add_column('BlockchainTransactions', sa.Column('message_index', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('BlockchainTransactions', 'message_index')
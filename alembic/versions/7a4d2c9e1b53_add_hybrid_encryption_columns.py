@@ -0,0 +1,38 @@
+"""add wrapped_key to BlockchainTransactions and payload_hash to BlockchainPayloads
+
+Revision ID: 7a4d2c9e1b53
+Revises: 0b6d3e8f4a21
+Create Date: 2026-10-18 19:02:41.817306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4d2c9e1b53'
+down_revision: Union[str, Sequence[str], None] = '0b6d3e8f4a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('BlockchainTransactions', sa.Column('wrapped_key', sa.Text(), nullable=True))
+    op.add_column('BlockchainPayloads', sa.Column('payload_hash', sa.CHAR(length=64), nullable=True))
+    # Старые payload'ы принадлежат ровно одной транзакции — берём хеш у неё
+    op.execute(
+        'UPDATE "BlockchainPayloads" AS p SET payload_hash = t.payload_hash '
+        'FROM "BlockchainTransactions" AS t WHERE t.transaction_id = p.transaction_id'
+    )
+    op.alter_column('BlockchainPayloads', 'payload_hash', existing_type=sa.CHAR(length=64), nullable=False)
+    op.create_index('ix_BlockchainPayloads_payload_hash', 'BlockchainPayloads', ['payload_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_BlockchainPayloads_payload_hash', table_name='BlockchainPayloads')
+    op.drop_column('BlockchainPayloads', 'payload_hash')
+    op.drop_column('BlockchainTransactions', 'wrapped_key')
@@ -0,0 +1,72 @@
+"""store payloads, signatures and wrapped keys as bytea
+
+Revision ID: 9e5b1f7c3a06
+Revises: 7a4d2c9e1b53
+Create Date: 2026-10-18 19:37:12.550964
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e5b1f7c3a06'
+down_revision: Union[str, Sequence[str], None] = '7a4d2c9e1b53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (таблица, колонка, nullable, первичный ключ)
+COLUMNS = [
+    ('BlockchainPayloads', 'encrypted_data', False, 'payload_id'),
+    ('BlockchainTransactions', 'signature', False, 'transaction_id'),
+    ('BlockchainTransactions', 'wrapped_key', True, 'transaction_id'),
+]
+
+# Строгий base64 без пробельных символов (их decode() пропускает)
+BASE64_PATTERN = r'^([A-Za-z0-9+/]{4})*([A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?$'
+
+
+def check_base64(table: str, column: str, pk: str) -> None:
+    """Одна строка не в base64 оборвала бы весь ALTER — проверяем заранее и называем строки."""
+    result = op.get_bind().execute(sa.text(
+        f'SELECT "{pk}" FROM "{table}" '
+        f"WHERE {column} IS NOT NULL AND regexp_replace({column}, '\\s', '', 'g') !~ :pattern "
+        f'ORDER BY "{pk}"'
+    ), {"pattern": BASE64_PATTERN})
+    invalid = [row[0] for row in result]
+    if invalid:
+        raise RuntimeError(
+            f'{table}.{column}: {len(invalid)} строк не в base64 ({pk}: {invalid[:20]}). '
+            f'Исправьте или удалите их и повторите миграцию'
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column, _, pk in COLUMNS:
+        check_base64(table, column, pk)
+
+    # Перезапись таблиц: на больших базах выполнять в окно обслуживания
+    for table, column, nullable, _ in COLUMNS:
+        op.alter_column(
+            table, column,
+            existing_type=sa.Text(),
+            type_=sa.LargeBinary(),
+            existing_nullable=nullable,
+            postgresql_using=f"decode({column}, 'base64')",
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column, nullable, _ in COLUMNS:
+        # encode() вставляет перевод строки каждые 76 символов — убираем их
+        op.alter_column(
+            table, column,
+            existing_type=sa.LargeBinary(),
+            type_=sa.Text(),
+            existing_nullable=nullable,
+            postgresql_using=f"translate(encode({column}, 'base64'), E'\\n', '')",
+        )
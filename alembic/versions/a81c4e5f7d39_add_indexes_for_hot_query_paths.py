@@ -0,0 +1,64 @@
+"""add indexes for hot query paths
+
+Revision ID: a81c4e5f7d39
+Revises: 6d1a3f8b9c20
+Create Date: 2026-10-18 21:24:17.336902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81c4e5f7d39'
+down_revision: Union[str, Sequence[str], None] = '6d1a3f8b9c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя, таблица, колонки)
+INDEXES = [
+    ('ix_Users_email', 'Users', ['email']),
+    ('ix_ChatMembers_user_id_chat_id', 'ChatMembers', ['user_id', 'chat_id']),
+    ('ix_ChatUserRoles_chat_id_user_id', 'ChatUserRoles', ['chat_id', 'user_id']),
+    ('ix_BlockchainTransactions_receiver_id', 'BlockchainTransactions', ['receiver_id']),
+    ('ix_BlockchainTransactions_sender_id', 'BlockchainTransactions', ['sender_id']),
+    ('ix_BlockchainFiles_transaction_id', 'BlockchainFiles', ['transaction_id']),
+    ('ix_RefreshTokens_user_id_device_id', 'RefreshTokens', ['user_id', 'device_id']),
+]
+
+BLOCK_MESSAGE_INDEX = 'ix_BlockchainTransactions_block_id_message_index'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY не блокирует запись, но не работает внутри транзакции.
+    # if_not_exists — чтобы прерванную миграцию можно было просто запустить снова
+    # (невалидный индекс после сбоя CONCURRENTLY нужно удалить вручную).
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+        # (block_id, message_index) становится покрывающим: строим новый рядом и подменяем
+        op.create_index(
+            BLOCK_MESSAGE_INDEX + '_new', 'BlockchainTransactions', ['block_id', 'message_index'],
+            unique=False, postgresql_include=['receiver_id', 'transaction_id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index(BLOCK_MESSAGE_INDEX, table_name='BlockchainTransactions', postgresql_concurrently=True, if_exists=True)
+        op.execute(f'ALTER INDEX "{BLOCK_MESSAGE_INDEX}_new" RENAME TO "{BLOCK_MESSAGE_INDEX}"')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            BLOCK_MESSAGE_INDEX + '_old', 'BlockchainTransactions', ['block_id', 'message_index'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index(BLOCK_MESSAGE_INDEX, table_name='BlockchainTransactions', postgresql_concurrently=True, if_exists=True)
+        op.execute(f'ALTER INDEX "{BLOCK_MESSAGE_INDEX}_old" RENAME TO "{BLOCK_MESSAGE_INDEX}"')
+
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,49 @@
+"""content-addressed BlockchainPayloads keyed by payload_hash
+
+Revision ID: c3f8a61d2e47
+Revises: 9e5b1f7c3a06
+Create Date: 2026-10-18 20:04:55.193027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a61d2e47'
+down_revision: Union[str, Sequence[str], None] = '9e5b1f7c3a06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Повторные отправки одного шифртекста оставили дубликаты — оставляем самый ранний
+    op.execute(
+        'DELETE FROM "BlockchainPayloads" AS p USING "BlockchainPayloads" AS d '
+        'WHERE p.payload_hash = d.payload_hash AND p.payload_id > d.payload_id'
+    )
+    op.drop_index('ix_BlockchainPayloads_payload_hash', table_name='BlockchainPayloads')
+    op.create_index('ix_BlockchainPayloads_payload_hash', 'BlockchainPayloads', ['payload_hash'], unique=True)
+    # Payload больше не принадлежит одной транзакции; FK удаляется вместе с колонкой
+    op.drop_column('BlockchainPayloads', 'transaction_id')
+    op.add_column('BlockchainPayloads', sa.Column('last_referenced_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_BlockchainTransactions_payload_hash', 'BlockchainTransactions', ['payload_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_BlockchainTransactions_payload_hash', table_name='BlockchainTransactions')
+    op.drop_column('BlockchainPayloads', 'last_referenced_at')
+    op.add_column('BlockchainPayloads', sa.Column('transaction_id', sa.Integer(), nullable=True))
+    op.execute(
+        'UPDATE "BlockchainPayloads" AS p SET transaction_id = ('
+        'SELECT min(t.transaction_id) FROM "BlockchainTransactions" AS t WHERE t.payload_hash = p.payload_hash)'
+    )
+    op.execute('DELETE FROM "BlockchainPayloads" WHERE transaction_id IS NULL')
+    op.alter_column('BlockchainPayloads', 'transaction_id', existing_type=sa.Integer(), nullable=False)
+    op.create_foreign_key(None, 'BlockchainPayloads', 'BlockchainTransactions', ['transaction_id'], ['transaction_id'], ondelete='CASCADE')
+    op.drop_index('ix_BlockchainPayloads_payload_hash', table_name='BlockchainPayloads')
+    op.create_index('ix_BlockchainPayloads_payload_hash', 'BlockchainPayloads', ['payload_hash'], unique=False)
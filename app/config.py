@@ -24,6 +24,15 @@ class Settings(BaseSettings):
     EMAIL_HOST_USER: str
     EMAIL_HOST_PASSWORD: str
 
+    BLOCK_INTERVAL_MS: int = 200  # как часто block producer запечатывает mempool
+    BLOCK_MAX_TRANSACTIONS: int = 1000  # запечатать раньше, если набралось столько транзакций
+    PER_CHAT_CHAINS: bool = False  # у каждого чата своя независимая цепочка блоков
+    SIGNATURE_VERIFICATION: str = "off"  # off | strict | audit — проверка подписей при отправке
+    SIGNATURE_VERIFY_WORKERS: int = 0  # процессов для проверки подписей (0 — по числу ядер)
+    MESSAGE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # кэш последних сообщений чатов (0 — выключен)
+    MESSAGE_CACHE_MESSAGES: int = 200  # последних сообщений на пару (чат, пользователь)
+    JSON_ENCODER: str = "auto"  # auto | orjson | json — кодировщик JSON-ответов (auto: orjson, если установлен)
+
     S3_ENDPOINT: str = "https://storage.yandexcloud.net"
     S3_BUCKET: str
     S3_REGION: str = "ru-central1"
@@ -1,6 +1,7 @@
 from sqlalchemy import select, insert, update
 from app.database.models import Email_verifications, Users, UserKeys
 from app.database.db import engine
+from app.database.versions import bump_user_chats_version
 from datetime import datetime
 
 
@@ -101,6 +102,7 @@ async def activate_user_account(user_id: int):
             .where(Users.c.user_id == user_id)
             .values(is_activated_acc=True)
         )
+        await conn.execute(bump_user_chats_version(user_id))
 
 
 async def save_public_key(user_id: int, public_key: str):
@@ -124,11 +126,15 @@ async def update_verification_user_id(email: str, user_id: int, now: datetime):
 
 async def update_user_password(email: str, hashed: str):
     async with engine.begin() as conn:
-        await conn.execute(
+        result = await conn.execute(
             update(Users)
             .where(Users.c.email == email)
             .values(password_hash=hashed)
+            .returning(Users.c.user_id)
         )
+        # last_seen обновляется при любом UPDATE Users (onupdate), а он есть в ответе участников чата
+        for user_id in result.scalars().all():
+            await conn.execute(bump_user_chats_version(user_id))
 
 
 async def touch_email_verification(email: str, now: datetime):
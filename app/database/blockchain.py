@@ -1,8 +1,84 @@
-from sqlalchemy import select, insert
+import asyncio
+from sqlalchemy import select, insert, update, delete, func, exists, literal, cast, bindparam, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.database.db import engine
-from app.database.models import BlockchainBlocks, BlockchainTransactions, BlockchainPayloads
-from datetime import datetime
-from app.utils.blockchain import calculate_hash
+from app.database.models import (
+    BlockchainBlocks,
+    BlockchainTransactions,
+    BlockchainPayloads,
+    BlockchainVerifierCheckpoints,
+    Chats,
+    ChatMembers,
+    UserInbox,
+    Users,
+)
+from datetime import datetime, timedelta
+from app.utils.blockchain import calculate_hash, generate_block_data, merkle_root, hash_block, CURRENT_HASH_VERSION
+
+GENESIS_HASH = "0" * 64
+
+# Ключ pg_advisory_xact_lock, которым процессы сериализуют дописывание общей цепочки
+CHAIN_LOCK_KEY = 7_316_842_001
+# Пространство ключей (int4) для advisory lock'ов цепочек отдельных чатов
+CHAT_CHAIN_LOCK_NAMESPACE = 731_684
+# Ключ advisory lock'а на запись в UserInbox: seq выдаются и коммитятся в одном
+# порядке, иначе /sync мог бы пропустить запись с меньшим seq, закоммиченную позже
+INBOX_LOCK_KEY = 7_316_842_002
+
+
+def chain_filter(chat_id: int | None):
+    """Условие «блок принадлежит цепочке»: chat_id IS NULL — общая цепочка."""
+    if chat_id is None:
+        return BlockchainBlocks.c.chat_id.is_(None)
+    return BlockchainBlocks.c.chat_id == chat_id
+
+
+class ChainHead:
+    """
+    Закэшированный хеш последнего блока цепочки (общей или отдельного чата).
+
+    Внутри процесса дописывание сериализует asyncio.Lock, между процессами —
+    advisory lock Postgres. Голова читается из БД один раз и заново только
+    если выяснилось, что цепочку дописал другой процесс.
+    """
+
+    def __init__(self, chat_id: int | None = None):
+        self.chat_id = chat_id
+        self.block_hash: str | None = None
+        self.lock = asyncio.Lock()
+
+    async def load(self, conn):
+        result = await conn.execute(
+            select(BlockchainBlocks.c.block_hash)
+            .where(chain_filter(self.chat_id))
+            .order_by(BlockchainBlocks.c.block_id.desc())
+            .limit(1)
+        )
+        self.block_hash = result.scalar() or GENESIS_HASH
+
+    async def acquire_advisory_lock(self, conn):
+        if self.chat_id is None:
+            await conn.execute(select(func.pg_advisory_xact_lock(CHAIN_LOCK_KEY)))
+        else:
+            await conn.execute(
+                select(func.pg_advisory_xact_lock(CHAT_CHAIN_LOCK_NAMESPACE, self.chat_id % 2**31))
+            )
+
+
+_chain_heads: dict[int | None, ChainHead] = {}
+
+
+def get_chain_head(chat_id: int | None = None) -> ChainHead:
+    head = _chain_heads.get(chat_id)
+    if head is None:
+        head = _chain_heads[chat_id] = ChainHead(chat_id)
+    return head
+
+
+async def load_chain_head():
+    async with engine.connect() as conn:
+        await get_chain_head().load(conn)
+
 
 async def get_last_block():
     async with engine.connect() as conn:
@@ -28,7 +104,7 @@ async def create_block(prev_hash: str, nonce: int, creator_user_id: int):
         block_id = result.inserted_primary_key[0]
     return block_id, block_hash
 
-async def add_transaction(block_id: int, sender_id: int, receiver_id: int, chat_id: int, payload_hash: str, signature: str):
+async def add_transaction(block_id: int, sender_id: int, receiver_id: int, chat_id: int, payload_hash: str, signature: bytes):
     async with engine.begin() as conn:
         result = await conn.execute(
             insert(BlockchainTransactions).values(
@@ -43,11 +119,396 @@ async def add_transaction(block_id: int, sender_id: int, receiver_id: int, chat_
         )
         return result.inserted_primary_key[0]
 
-async def store_encrypted_payload(transaction_id: int, encrypted_data: str):
+async def store_encrypted_payload(encrypted_data: bytes, payload_hash: str):
     async with engine.begin() as conn:
+        await _upsert_payloads(conn, {payload_hash: encrypted_data})
+
+
+async def _upsert_payloads(conn, payloads: dict[str, bytes]):
+    """
+    Content-addressed запись: payload с уже известным хешем не дублируется.
+
+    При конфликте вместо DO NOTHING обновляется last_referenced_at — это берёт
+    блокировку строки и сдвигает метку, поэтому delete_unreferenced_payloads не
+    удалит payload, на который прямо сейчас ссылается незакоммиченная транзакция.
+    Хеши сортируются, чтобы параллельные блоки брали блокировки в одном порядке.
+    """
+    stmt = pg_insert(BlockchainPayloads)
+    await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[BlockchainPayloads.c.payload_hash],
+            set_={"last_referenced_at": func.now()},
+        ),
+        [
+            {"payload_hash": payload_hash, "encrypted_data": payloads[payload_hash]}
+            for payload_hash in sorted(payloads)
+        ]
+    )
+
+
+async def _insert_block_after(conn, prev_hash: str, nonce: int, creator_user_id: int | None, chat_id: int | None, root: str):
+    """
+    Вставляет блок поверх prev_hash, только если у prev_hash ещё нет потомка в этой цепочке.
+    Возвращает (block_id, block_hash) или None, если закэшированная голова устарела.
+    """
+    block_data = generate_block_data(prev_hash, nonce, creator_user_id, chat_id, merkle_root=root)
+    block_hash = hash_block(block_data, CURRENT_HASH_VERSION)
+    block_data["block_hash"] = block_hash
+    block_data["hash_version"] = CURRENT_HASH_VERSION
+
+    result = await conn.execute(
+        insert(BlockchainBlocks).from_select(
+            list(block_data),
+            select(*[literal(value, BlockchainBlocks.c[key].type) for key, value in block_data.items()])
+            .where(~exists().where(
+                BlockchainBlocks.c.previous_hash == cast(prev_hash, BlockchainBlocks.c.previous_hash.type),
+                chain_filter(chat_id),
+            ))
+        ).returning(BlockchainBlocks.c.block_id)
+    )
+    block_id = result.scalar()
+    if block_id is None:
+        return None
+    return block_id, block_hash
+
+
+async def _insert_transactions(conn, block_id: int, rows: list[tuple[int, dict]], now: datetime) -> list[int]:
+    # Один payload на шифртекст: в гибридном формате все получатели сообщения
+    # ссылаются на него по payload_hash, повторная отправка не создаёт копию
+    await _upsert_payloads(conn, {tx["payload_hash"]: tx["encrypted_data"] for _, tx in rows})
+
+    result = await conn.execute(
+        insert(BlockchainTransactions).returning(
+            BlockchainTransactions.c.transaction_id, sort_by_parameter_order=True
+        ),
+        [
+            {
+                "block_id": block_id,
+                "message_index": message_index,
+                "sender_id": tx["sender_id"],
+                "receiver_id": tx["receiver_id"],
+                "chat_id": tx["chat_id"],
+                "payload_hash": tx["payload_hash"],
+                "signature": tx["signature"],
+                "wrapped_key": tx.get("wrapped_key"),
+                "timestamp": now,
+            }
+            for message_index, tx in rows
+        ]
+    )
+    tx_ids = list(result.scalars().all())
+    inbox = inbox_entries(rows, tx_ids)
+
+    # Непрочитанные: +1 каждому получателю за сообщение, кроме самого отправителя.
+    # ChatMembers блокируются раньше Chats — в том же порядке, что и при удалении участника
+    unread = {}
+    for entry in inbox:
+        if entry["user_id"] != entry["sender_id"]:
+            key = (entry["chat_id"], entry["user_id"])
+            unread[key] = unread.get(key, 0) + 1
+    if unread:
+        await conn.execute(
+            update(ChatMembers)
+            .where(ChatMembers.c.chat_id == bindparam("target_chat_id"), ChatMembers.c.user_id == bindparam("target_user_id"))
+            .values(unread_count=ChatMembers.c.unread_count + bindparam("unread_delta")),
+            [
+                {"target_chat_id": cid, "target_user_id": uid, "unread_delta": unread[(cid, uid)]}
+                for cid, uid in sorted(unread)
+            ]
+        )
+
+    # Последнее сообщение чата — для списка чатов без MAX() по всем транзакциям.
+    # Строки Chats блокируются в порядке chat_id, как и payload'ы выше
+    last_by_chat = {}
+    for (_, tx), tx_id in zip(rows, tx_ids):
+        if tx["chat_id"] is not None:
+            last_by_chat[tx["chat_id"]] = max(tx_id, last_by_chat.get(tx["chat_id"], 0))
+    if last_by_chat:
         await conn.execute(
-            insert(BlockchainPayloads).values(
-                transaction_id=transaction_id,
-                encrypted_data=encrypted_data,
+            update(Chats)
+            .where(Chats.c.chat_id == bindparam("target_chat_id"))
+            .where(or_(Chats.c.last_transaction_id.is_(None), Chats.c.last_transaction_id < bindparam("last_tx_id")))
+            .values(last_message_at=now, last_transaction_id=bindparam("last_tx_id")),
+            [{"target_chat_id": cid, "last_tx_id": last_by_chat[cid]} for cid in sorted(last_by_chat)]
+        )
+
+    if inbox:
+        # Держится до коммита; берётся последним, после lock'а цепочки
+        await conn.execute(select(func.pg_advisory_xact_lock(INBOX_LOCK_KEY)))
+        await conn.execute(
+            insert(UserInbox).values(
+                sender_username=select(Users.c.username)
+                .where(Users.c.user_id == bindparam("inbox_sender_id"))
+                .scalar_subquery()
+            ),
+            [{**entry, "timestamp": now, "inbox_sender_id": entry["sender_id"]} for entry in inbox]
+        )
+    return tx_ids
+
+
+def inbox_entries(rows: list[tuple[int, dict]], tx_ids: list[int]) -> list[dict]:
+    """
+    Строки UserInbox для записанных транзакций: каждому участнику сообщения — его
+    собственная копия, а отправителю без своей копии — первая транзакция сообщения.
+    """
+    messages: dict[int, list[tuple[int, dict]]] = {}
+    for tx_id, (message_index, tx) in zip(tx_ids, rows):
+        if tx["chat_id"] is not None:
+            messages.setdefault(message_index, []).append((tx_id, tx))
+
+    entries = []
+    for transactions in messages.values():
+        chosen = {}
+        for tx_id, tx in transactions:
+            chosen.setdefault(tx["receiver_id"], (tx_id, tx))
+        chosen.setdefault(transactions[0][1]["sender_id"], transactions[0])
+
+        for user_id, (tx_id, tx) in chosen.items():
+            entries.append({
+                "user_id": user_id,
+                "chat_id": tx["chat_id"],
+                "transaction_id": tx_id,
+                "sender_id": tx["sender_id"],
+                "payload_hash": tx["payload_hash"],
+            })
+    return entries
+
+
+async def create_block_with_transactions(nonce: int, creator_user_id: int | None, messages: list[list[dict]], chat_id: int | None = None):
+    """
+    Записывает блок, все его транзакции и зашифрованные payload'ы одной транзакцией БД.
+
+    messages — список сообщений, каждое из которых — список dict с ключами
+    sender_id, receiver_id, chat_id, payload_hash, signature, encrypted_data
+    и необязательным wrapped_key (гибридный формат: encrypted_data у всех
+    получателей один). Payload'ы адресуются по payload_hash и хранятся в одном
+    экземпляре на шифртекст. signature, encrypted_data и
+    wrapped_key — сырые байты, base64 остаётся на границе API.
+    Позиция сообщения в списке сохраняется в message_index; Chats.last_message_at,
+    last_transaction_id и счётчики непрочитанных ChatMembers.unread_count
+    обновляются в той же транзакции. Вставки идут
+    многострочными INSERT ... RETURNING, поэтому число обращений к БД не зависит
+    от размера группы и количества сообщений в блоке.
+
+    Заголовок блока фиксирует Merkle-корень по payload_hash всех транзакций.
+    Блок ставится поверх закэшированной головы цепочки без отдельного запроса за
+    последним блоком. chat_id=None — общая цепочка, иначе отдельная цепочка чата
+    (режим PER_CHAT_CHAINS), которая дописывается независимо от остальных.
+
+    Возвращает (block_id, block_hash, tx_ids, sealed_at), где tx_ids — списки ID
+    транзакций в том же порядке, что и messages, а sealed_at — timestamp, записанный
+    в транзакции и UserInbox.
+    """
+    rows = [
+        (message_index, tx)
+        for message_index, transactions in enumerate(messages)
+        for tx in transactions
+    ]
+    inserted_ids = []
+    sealed_at = datetime.utcnow()
+    # Порядок листьев совпадает с порядком transaction_id внутри блока
+    root = merkle_root([tx["payload_hash"] for _, tx in rows])
+
+    chain_head = get_chain_head(chat_id)
+
+    async with chain_head.lock:
+        async with engine.begin() as conn:
+            await chain_head.acquire_advisory_lock(conn)
+
+            if chain_head.block_hash is None:
+                await chain_head.load(conn)
+
+            inserted = await _insert_block_after(conn, chain_head.block_hash, nonce, creator_user_id, chat_id, root)
+            if inserted is None:
+                # Цепочку дописал другой процесс: перечитываем голову под advisory lock
+                await chain_head.load(conn)
+                inserted = await _insert_block_after(conn, chain_head.block_hash, nonce, creator_user_id, chat_id, root)
+            block_id, block_hash = inserted
+
+            if rows:
+                inserted_ids = await _insert_transactions(conn, block_id, rows, sealed_at)
+
+        # Голову двигаем только после коммита
+        chain_head.block_hash = block_hash
+
+    tx_ids = [[] for _ in messages]
+    for tx_id, (message_index, _) in zip(inserted_ids, rows):
+        tx_ids[message_index].append(tx_id)
+
+    return block_id, block_hash, tx_ids, sealed_at
+
+
+async def get_transaction_with_block(transaction_id: int):
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(
+                BlockchainTransactions.c.transaction_id,
+                BlockchainTransactions.c.sender_id,
+                BlockchainTransactions.c.receiver_id,
+                BlockchainTransactions.c.payload_hash,
+                BlockchainBlocks,
+            )
+            .select_from(
+                BlockchainTransactions.join(
+                    BlockchainBlocks, BlockchainTransactions.c.block_id == BlockchainBlocks.c.block_id
+                )
+            )
+            .where(BlockchainTransactions.c.transaction_id == transaction_id)
+        )
+        return result.fetchone()
+
+
+async def get_block_transaction_hashes(block_id: int) -> list[tuple[int, str]]:
+    """(transaction_id, payload_hash) транзакций блока в порядке листьев Merkle-дерева."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(BlockchainTransactions.c.transaction_id, BlockchainTransactions.c.payload_hash)
+            .where(BlockchainTransactions.c.block_id == block_id)
+            .order_by(BlockchainTransactions.c.transaction_id)
+        )
+        return [(row.transaction_id, row.payload_hash) for row in result.fetchall()]
+
+
+async def get_blocks_after(block_id: int, limit: int, chat_id: int | None = None):
+    """
+    Keyset-пагинация по блокам: следующие limit блоков после block_id.
+    С chat_id — только блоки цепочки этого чата (по индексу (chat_id, block_id)).
+    """
+    query = select(BlockchainBlocks).where(BlockchainBlocks.c.block_id > block_id)
+    if chat_id is not None:
+        query = query.where(BlockchainBlocks.c.chat_id == chat_id)
+    async with engine.connect() as conn:
+        result = await conn.execute(query.order_by(BlockchainBlocks.c.block_id).limit(limit))
+        return result.fetchall()
+
+
+async def get_payload_hashes_for_blocks(block_ids: list[int]) -> dict[int, list[str]]:
+    """payload_hash транзакций каждого блока в порядке листьев Merkle-дерева."""
+    hashes = {block_id: [] for block_id in block_ids}
+    if not block_ids:
+        return hashes
+
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(BlockchainTransactions.c.block_id, BlockchainTransactions.c.payload_hash)
+            .where(BlockchainTransactions.c.block_id.in_(block_ids))
+            .order_by(BlockchainTransactions.c.block_id, BlockchainTransactions.c.transaction_id)
+        )
+        for row in result.fetchall():
+            hashes[row.block_id].append(row.payload_hash)
+    return hashes
+
+
+async def get_payloads_for_blocks(block_ids: list[int]) -> dict[int, list[tuple[str, bytes | None]]]:
+    """
+    (payload_hash, encrypted_data) каждого различного payload'а транзакций блока;
+    encrypted_data=None — payload'а с таким хешем нет.
+    """
+    payloads = {block_id: [] for block_id in block_ids}
+    if not block_ids:
+        return payloads
+
+    # Общий шифртекст гибридного сообщения читается один раз на блок, а не на каждого получателя
+    referenced = (
+        select(BlockchainTransactions.c.block_id, BlockchainTransactions.c.payload_hash)
+        .where(BlockchainTransactions.c.block_id.in_(block_ids))
+        .distinct()
+        .subquery()
+    )
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(referenced.c.block_id, referenced.c.payload_hash, BlockchainPayloads.c.encrypted_data)
+            .select_from(
+                referenced.outerjoin(BlockchainPayloads, BlockchainPayloads.c.payload_hash == referenced.c.payload_hash)
+            )
+        )
+        for row in result.fetchall():
+            payloads[row.block_id].append((row.payload_hash, row.encrypted_data))
+    return payloads
+
+
+async def get_chain_hashes_before(chat_ids: list[int | None], block_id: int) -> dict[int | None, str]:
+    """Хеш последнего блока каждой из цепочек chat_ids среди блоков с block_id < block_id."""
+    heads = {}
+    async with engine.connect() as conn:
+        for chat_id in chat_ids:
+            result = await conn.execute(
+                select(BlockchainBlocks.c.block_hash)
+                .where(chain_filter(chat_id), BlockchainBlocks.c.block_id < block_id)
+                .order_by(BlockchainBlocks.c.block_id.desc())
+                .limit(1)
+            )
+            heads[chat_id] = result.scalar() or GENESIS_HASH
+    return heads
+
+
+async def get_verifier_checkpoint(name: str = "default") -> int:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(BlockchainVerifierCheckpoints.c.last_block_id)
+            .where(BlockchainVerifierCheckpoints.c.name == name)
+        )
+        return result.scalar() or 0
+
+
+async def save_verifier_checkpoint(last_block_id: int, name: str = "default"):
+    async with engine.begin() as conn:
+        stmt = pg_insert(BlockchainVerifierCheckpoints).values(
+            name=name,
+            last_block_id=last_block_id,
+            updated_at=datetime.utcnow(),
+        )
+        await conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[BlockchainVerifierCheckpoints.c.name],
+                set_={"last_block_id": stmt.excluded.last_block_id, "updated_at": stmt.excluded.updated_at},
+            )
+        )
+
+
+# asyncpg передаёт каждый элемент IN (...) отдельным параметром, а их не больше 32767 на запрос
+PAYLOAD_DELETE_CHUNK = 10000
+
+
+async def delete_payloads(payload_hashes: list[str]) -> int:
+    """
+    Удаляет payload'ы с данными хешами, на которые не ссылается ни одна транзакция
+    (для очистки засеянных данных). Хеши передаются пачками по PAYLOAD_DELETE_CHUNK.
+    """
+    deleted = 0
+    async with engine.begin() as conn:
+        for i in range(0, len(payload_hashes), PAYLOAD_DELETE_CHUNK):
+            result = await conn.execute(
+                delete(BlockchainPayloads).where(
+                    BlockchainPayloads.c.payload_hash.in_(payload_hashes[i:i + PAYLOAD_DELETE_CHUNK]),
+                    ~exists().where(BlockchainTransactions.c.payload_hash == BlockchainPayloads.c.payload_hash),
+                )
+            )
+            deleted += result.rowcount
+    return deleted
+
+
+async def delete_unreferenced_payloads(older_than: timedelta, limit: int) -> int:
+    """
+    Удаляет до limit payload'ов, на которые не ссылается ни одна транзакция
+    (транзакции удаляются каскадом вместе с блоками, чатами и пользователями).
+    Payload'ы, к которым обращались позже чем older_than назад, не трогаются.
+    """
+    cutoff = func.now() - older_than
+    unreferenced = (
+        select(BlockchainPayloads.c.payload_id)
+        .where(
+            BlockchainPayloads.c.last_referenced_at < cutoff,
+            ~exists().where(BlockchainTransactions.c.payload_hash == BlockchainPayloads.c.payload_hash),
+        )
+        .limit(limit)
+    )
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            delete(BlockchainPayloads).where(
+                BlockchainPayloads.c.payload_id.in_(unreferenced),
+                # Перепроверяется на свежей версии строки, если её успела обновить отправка
+                BlockchainPayloads.c.last_referenced_at < cutoff,
             )
         )
+        return result.rowcount
@@ -0,0 +1,142 @@
+from sqlalchemy import select, update, func, true
+from app.database.db import engine
+from app.database.models import BlockchainTransactions, BlockchainPayloads, UserInbox, ChatMembers
+
+
+def select_chat_messages_page(
+    chat_id: int,
+    user_id: int,
+    limit: int | None,
+    direction: str = "before",
+    cursor: int | None = None,
+):
+    """
+    Одна страница сообщений чата для user_id — диапазонное чтение UserInbox по
+    индексу (user_id, chat_id, seq).
+
+    Какую транзакцию сообщения показывать пользователю, решено при записи блока
+    (inbox_entries): своя копия, а если её нет — первая транзакция сообщения.
+    Имя отправителя хранится в самом инбоксе, так что Users не читается.
+
+    direction="before" — записи старше cursor (без cursor — последние), по убыванию seq;
+    direction="after" — новее cursor (без cursor — с начала), по возрастанию.
+    Выбирается limit + 1 строка, чтобы понять, есть ли следующая страница;
+    limit=None — без ограничения, для потоковой выгрузки всей истории.
+    """
+    inbox = UserInbox
+    tx = BlockchainTransactions
+
+    if direction == "before":
+        order = inbox.c.seq.desc()
+        page_filter = inbox.c.seq < cursor if cursor is not None else true()
+    else:
+        order = inbox.c.seq.asc()
+        page_filter = inbox.c.seq > cursor if cursor is not None else true()
+
+    query = (
+        select(
+            inbox.c.seq,
+            inbox.c.transaction_id,
+            inbox.c.sender_id,
+            tx.c.signature,
+            tx.c.wrapped_key,
+            tx.c.timestamp,
+            BlockchainPayloads.c.encrypted_data,
+            inbox.c.sender_username.label("username"),
+        )
+        .select_from(
+            inbox
+            .join(tx, inbox.c.transaction_id == tx.c.transaction_id)
+            .join(BlockchainPayloads, inbox.c.payload_hash == BlockchainPayloads.c.payload_hash)
+        )
+        .where(inbox.c.user_id == user_id, inbox.c.chat_id == chat_id, page_filter)
+        .order_by(order)
+    )
+    return query if limit is None else query.limit(limit + 1)
+
+
+def select_inbox_entries(chat_id: int, transaction_ids: list[int]):
+    """Записи инбоксов всех участников для только что запечатанных транзакций — для дописывания в кэш."""
+    return (
+        select(
+            UserInbox.c.user_id,
+            UserInbox.c.seq,
+            UserInbox.c.transaction_id,
+            UserInbox.c.sender_id,
+            BlockchainTransactions.c.signature,
+            BlockchainTransactions.c.wrapped_key,
+            BlockchainTransactions.c.timestamp,
+            BlockchainPayloads.c.encrypted_data,
+            UserInbox.c.sender_username.label("username"),
+        )
+        .select_from(
+            UserInbox
+            .join(BlockchainTransactions, UserInbox.c.transaction_id == BlockchainTransactions.c.transaction_id)
+            .join(BlockchainPayloads, UserInbox.c.payload_hash == BlockchainPayloads.c.payload_hash)
+        )
+        .where(UserInbox.c.chat_id == chat_id, UserInbox.c.transaction_id.in_(transaction_ids))
+    )
+
+
+async def get_chat_messages_page(chat_id: int, user_id: int, limit: int, direction: str = "before", cursor=None):
+    async with engine.connect() as conn:
+        result = await conn.execute(select_chat_messages_page(chat_id, user_id, limit, direction, cursor))
+        return result.fetchall()
+
+
+async def get_inbox_entries(chat_id: int, transaction_ids: list[int]):
+    async with engine.connect() as conn:
+        result = await conn.execute(select_inbox_entries(chat_id, transaction_ids))
+        return result.fetchall()
+
+
+async def mark_chat_read(chat_id: int, user_id: int, transaction_id: int | None = None):
+    """
+    Сдвигает маркер прочтения участника до transaction_id (None — до последнего
+    сообщения) и пересчитывает unread_count по хвосту его инбокса после маркера.
+    Маркер назад не двигается. Возвращает строку (last_read_transaction_id,
+    unread_count); None — пользователь не участник. ValueError — в ленте
+    пользователя нет такого сообщения.
+    """
+    own = (UserInbox.c.user_id == user_id) & (UserInbox.c.chat_id == chat_id)
+    async with engine.begin() as conn:
+        # Строка участника блокируется до коммита: запечатывание, которое увеличит
+        # счётчик, дождётся нас, а всё закоммиченное раньше увидят запросы ниже
+        result = await conn.execute(
+            select(ChatMembers.c.last_read_transaction_id, ChatMembers.c.unread_count)
+            .where(ChatMembers.c.chat_id == chat_id, ChatMembers.c.user_id == user_id)
+            .with_for_update()
+        )
+        member = result.fetchone()
+        if member is None:
+            return None
+
+        query = select(UserInbox.c.seq, UserInbox.c.transaction_id).where(own)
+        if transaction_id is None:
+            query = query.order_by(UserInbox.c.seq.desc()).limit(1)
+        else:
+            query = query.where(UserInbox.c.transaction_id == transaction_id)
+        target = (await conn.execute(query)).fetchone()
+        if target is None:
+            if transaction_id is not None:
+                raise ValueError("Сообщение не найдено в этом чате")
+            return member
+
+        # В пределах чата transaction_id растут вместе с seq инбокса
+        if member.last_read_transaction_id is not None and member.last_read_transaction_id >= target.transaction_id:
+            return member
+
+        # Непрочитанными остаются только записи после маркера — короткий диапазон индекса
+        unread = (
+            select(func.count())
+            .select_from(UserInbox)
+            .where(own, UserInbox.c.seq > target.seq, UserInbox.c.sender_id != user_id)
+            .scalar_subquery()
+        )
+        result = await conn.execute(
+            update(ChatMembers)
+            .where(ChatMembers.c.chat_id == chat_id, ChatMembers.c.user_id == user_id)
+            .values(last_read_transaction_id=target.transaction_id, unread_count=unread)
+            .returning(ChatMembers.c.last_read_transaction_id, ChatMembers.c.unread_count)
+        )
+        return result.fetchone()
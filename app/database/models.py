@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Table, Column, Integer, BigInteger, String, Text, DateTime, ForeignKey,
-    MetaData, CheckConstraint, Numeric, UniqueConstraint, CHAR, Date, Boolean
+    MetaData, CheckConstraint, Numeric, UniqueConstraint, CHAR, Date, Boolean, Index, SmallInteger, LargeBinary
 )
 from sqlalchemy.sql import func
 
@@ -31,6 +31,13 @@ Chats = Table(
     Column("chat_type", String(20), nullable=False),
     Column("creator_user_id", Integer, nullable=False),
     Column("description", Text),
+    # Растёт при изменении состава участников или их профилей — версия для ETag
+    Column("members_version", Integer, nullable=False, server_default="0"),
+    # Последнее сообщение чата, обновляется при запечатывании блока. Индекса по
+    # last_message_at нет намеренно: список чатов сортирует только строки одного
+    # пользователя, а индекс сделал бы каждое обновление при отправке не-HOT
+    Column("last_message_at", DateTime),
+    Column("last_transaction_id", BigInteger),
     CheckConstraint("chat_type IN ('private', 'group', 'channel')")
 )
 
@@ -73,6 +80,7 @@ Users = Table(
     Column("birth_date", Date, nullable=False),
     Column("last_seen", DateTime, nullable=False, server_default=func.now(), onupdate=func.now()),
     Column("is_activated_acc", Boolean, default=False),
+    Index("ix_Users_email", "email"),
 )
 
 Email_verifications = Table(
@@ -99,6 +107,9 @@ ChatMembers = Table(
     Column("user_id", Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), primary_key=True),
     Column("display_name", String),
     Column("joined_at", DateTime, nullable=False, server_default=func.now()),
+    Column("last_read_transaction_id", BigInteger),  # последнее прочитанное сообщение
+    Column("unread_count", Integer, nullable=False, server_default="0"),  # ведётся при отправке и чтении
+    Index("ix_ChatMembers_user_id_chat_id", "user_id", "chat_id"),  # PK (chat_id, user_id) не помогает поиску чатов пользователя
 )
 
 ChatUserRoles = Table(
@@ -108,6 +119,7 @@ ChatUserRoles = Table(
     Column("user_id", Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False),
     Column("role_id", Integer, ForeignKey("Roles.role_id"), nullable=False),
     Column("assigned_at", DateTime, nullable=False, server_default=func.now()),
+    Index("ix_ChatUserRoles_chat_id_user_id", "chat_id", "user_id"),
 )
 
 PaymentMethods = Table(
@@ -135,25 +147,80 @@ BlockchainBlocks = Table(
     Column("timestamp", DateTime, nullable=False, server_default=func.now()),
     Column("nonce", BigInteger, nullable=False),
     Column("creator_user_id", Integer, ForeignKey("Users.user_id", ondelete="CASCADE")),
+    Column("chat_id", BigInteger, ForeignKey("Chats.chat_id", ondelete="CASCADE"), nullable=True),  # NULL — общая цепочка
+    Column("merkle_root", CHAR(64), nullable=True),  # NULL у блоков, созданных до Merkle-корней
+    Column("hash_version", SmallInteger, nullable=False, server_default="0"),  # 0 — legacy JSON, 1 — бинарное кодирование
+    Index("ix_BlockchainBlocks_previous_hash_chat_id", "previous_hash", "chat_id"),
+    Index("ix_BlockchainBlocks_chat_id_block_id", "chat_id", "block_id"),
 )
 
 BlockchainTransactions = Table(
     "BlockchainTransactions", metadata,
     Column("transaction_id", BigInteger, primary_key=True, autoincrement=True),
     Column("block_id", Integer, ForeignKey("BlockchainBlocks.block_id", ondelete="CASCADE"), nullable=False),
+    Column("message_index", Integer, nullable=False, server_default="0"),  # номер сообщения внутри блока
     Column("sender_id", Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False),
     Column("receiver_id", Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False),
     Column("chat_id", BigInteger, ForeignKey("Chats.chat_id", ondelete="CASCADE"), nullable=True),
     Column("payload_hash", CHAR(64), nullable=False),
-    Column("signature", Text, nullable=False),
+    Column("signature", LargeBinary, nullable=False),  # сырые байты; в base64 только на границе API
+    Column("wrapped_key", LargeBinary, nullable=True),  # AES-ключ, зашифрованный RSA получателя; NULL — payload целиком в RSA
     Column("timestamp", DateTime, nullable=False, server_default=func.now()),
+    Index("ix_BlockchainTransactions_payload_hash", "payload_hash"),
+    Index("ix_BlockchainTransactions_chat_id", "chat_id"),  # каскадное удаление чата; история читается из UserInbox
+    # Покрывающий: NOT EXISTS при выборе транзакции сообщения читает только индекс
+    Index(
+        "ix_BlockchainTransactions_block_id_message_index", "block_id", "message_index",
+        postgresql_include=["receiver_id", "transaction_id"],
+    ),
+    # Каскадное удаление пользователя ищет его транзакции по sender_id/receiver_id
+    Index("ix_BlockchainTransactions_receiver_id", "receiver_id"),
+    Index("ix_BlockchainTransactions_sender_id", "sender_id"),
 )
 
 BlockchainPayloads = Table(
     "BlockchainPayloads", metadata,
     Column("payload_id", BigInteger, primary_key=True, autoincrement=True),
-    Column("transaction_id", Integer, ForeignKey("BlockchainTransactions.transaction_id", ondelete="CASCADE"), nullable=False),
-    Column("encrypted_data", Text, nullable=False),
+    Column("payload_hash", CHAR(64), nullable=False),  # адрес payload'а: транзакции ссылаются на него по хешу
+    Column("encrypted_data", LargeBinary, nullable=False),
+    Column("last_referenced_at", DateTime, nullable=False, server_default=func.now()),  # для очистки неиспользуемых
+    Index("ix_BlockchainPayloads_payload_hash", "payload_hash", unique=True),
+)
+
+# Денормализованный inbox: по строке на (получатель, сообщение), пишется в той же
+# транзакции БД, что и блок. Лента чата читается одним диапазоном по (user_id, chat_id, seq)
+UserInbox = Table(
+    "UserInbox", metadata,
+    Column("seq", BigInteger, primary_key=True, autoincrement=True),  # монотонный порядок записи
+    Column("user_id", Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False),
+    Column("chat_id", BigInteger, ForeignKey("Chats.chat_id", ondelete="CASCADE"), nullable=False),
+    Column("transaction_id", BigInteger, ForeignKey("BlockchainTransactions.transaction_id", ondelete="CASCADE"), nullable=False),
+    Column("sender_id", Integer, nullable=False),
+    Column("sender_username", String(50), nullable=False),
+    Column("payload_hash", CHAR(64), nullable=False),
+    Column("timestamp", DateTime, nullable=False),
+    Index("ix_UserInbox_user_id_chat_id_seq", "user_id", "chat_id", "seq"),
+    Index("ix_UserInbox_transaction_id", "transaction_id"),
+    Index("ix_UserInbox_sender_id", "sender_id"),  # обновление sender_username при смене имени
+    Index("ix_UserInbox_user_id_seq", "user_id", "seq"),  # /sync: всё новое по всем чатам пользователя
+)
+
+ChatMembershipEvents = Table(
+    "ChatMembershipEvents", metadata,
+    Column("event_id", BigInteger, primary_key=True, autoincrement=True),
+    Column("user_id", Integer, ForeignKey("Users.user_id", ondelete="CASCADE"), nullable=False),
+    Column("chat_id", BigInteger, ForeignKey("Chats.chat_id", ondelete="CASCADE"), nullable=False),
+    Column("event_type", String(10), nullable=False),
+    Column("created_at", DateTime, nullable=False, server_default=func.now()),
+    CheckConstraint("event_type IN ('joined', 'left')"),
+    Index("ix_ChatMembershipEvents_user_id_event_id", "user_id", "event_id"),
+)
+
+BlockchainVerifierCheckpoints = Table(
+    "BlockchainVerifierCheckpoints", metadata,
+    Column("name", String(50), primary_key=True),
+    Column("last_block_id", BigInteger, nullable=False),  # последний проверенный блок
+    Column("updated_at", DateTime, nullable=False, server_default=func.now()),
 )
 
 UserKeys = Table(
@@ -175,6 +242,7 @@ BlockchainFiles = Table(
     Column("file_hash", String(64), nullable=False),  # SHA256 хеш исходного файла
     Column("thumbnail_base64", Text),  # превью (опционально, например, для изображений)
     Column("created_at", DateTime, nullable=False, server_default=func.now()),
+    Index("ix_BlockchainFiles_transaction_id", "transaction_id"),
 )
 
 RefreshTokens = Table(
@@ -186,4 +254,5 @@ RefreshTokens = Table(
     Column("expires_at", DateTime, nullable=False),
     Column("created_at", DateTime, nullable=False, server_default=func.now()),
     Column("is_revoked", Boolean, nullable=False, server_default="false"),
+    Index("ix_RefreshTokens_user_id_device_id", "user_id", "device_id"),
 )
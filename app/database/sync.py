@@ -0,0 +1,81 @@
+from sqlalchemy import select, insert, func
+from app.database.db import engine
+from app.database.models import (
+    ChatMembershipEvents,
+    UserInbox,
+    BlockchainTransactions,
+    BlockchainPayloads,
+)
+
+# Ключ advisory lock'а на запись событий участия — тот же приём, что INBOX_LOCK_KEY:
+# event_id коммитятся в порядке выдачи, и курсор /sync не перескакивает через них
+MEMBERSHIP_EVENTS_LOCK_KEY = 7_316_842_003
+
+
+async def record_membership_events(conn, chat_id: int, user_ids: list[int], event_type: str):
+    """Пишет события joined/left в транзакции, которая меняет ChatMembers."""
+    if not user_ids:
+        return
+    await conn.execute(select(func.pg_advisory_xact_lock(MEMBERSHIP_EVENTS_LOCK_KEY)))
+    await conn.execute(
+        insert(ChatMembershipEvents),
+        [{"user_id": user_id, "chat_id": chat_id, "event_type": event_type} for user_id in user_ids]
+    )
+
+
+async def get_sync_position(user_id: int) -> tuple[int, int]:
+    """Текущая позиция пользователя: (последний seq инбокса, последний event_id)."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(
+                select(func.coalesce(func.max(UserInbox.c.seq), 0))
+                .where(UserInbox.c.user_id == user_id)
+                .scalar_subquery(),
+                select(func.coalesce(func.max(ChatMembershipEvents.c.event_id), 0))
+                .where(ChatMembershipEvents.c.user_id == user_id)
+                .scalar_subquery(),
+            )
+        )
+        return tuple(result.one())
+
+
+async def get_changes_since(user_id: int, seq: int, event_id: int, limit: int):
+    """
+    Новые записи инбокса пользователя по всем чатам (seq > seq) и события участия
+    (event_id > event_id), по возрастанию. Обе выборки — диапазон по индексу
+    (user_id, seq) / (user_id, event_id); выбирается limit + 1 строка.
+    """
+    async with engine.connect() as conn:
+        messages = await conn.execute(
+            select(
+                UserInbox.c.seq,
+                UserInbox.c.chat_id,
+                UserInbox.c.transaction_id,
+                UserInbox.c.sender_id,
+                BlockchainTransactions.c.signature,
+                BlockchainTransactions.c.wrapped_key,
+                BlockchainTransactions.c.timestamp,
+                BlockchainPayloads.c.encrypted_data,
+                UserInbox.c.sender_username.label("username"),
+            )
+            .select_from(
+                UserInbox
+                .join(BlockchainTransactions, UserInbox.c.transaction_id == BlockchainTransactions.c.transaction_id)
+                .join(BlockchainPayloads, UserInbox.c.payload_hash == BlockchainPayloads.c.payload_hash)
+            )
+            .where(UserInbox.c.user_id == user_id, UserInbox.c.seq > seq)
+            .order_by(UserInbox.c.seq)
+            .limit(limit + 1)
+        )
+        events = await conn.execute(
+            select(
+                ChatMembershipEvents.c.event_id,
+                ChatMembershipEvents.c.chat_id,
+                ChatMembershipEvents.c.event_type,
+                ChatMembershipEvents.c.created_at,
+            )
+            .where(ChatMembershipEvents.c.user_id == user_id, ChatMembershipEvents.c.event_id > event_id)
+            .order_by(ChatMembershipEvents.c.event_id)
+            .limit(limit + 1)
+        )
+        return messages.fetchall(), events.fetchall()
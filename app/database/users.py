@@ -1,6 +1,7 @@
 from sqlalchemy import select, insert, update, delete
-from app.database.models import Users, Admins, UserKeys
+from app.database.models import Users, Admins, UserKeys, UserInbox
 from app.database.db import engine
+from app.database.versions import bump_user_chats_version
 from datetime import datetime
 
 
@@ -29,9 +30,33 @@ async def insert_user(data: dict, hashed_password: str, birth_date: datetime):
         ))
         return result.inserted_primary_key[0]
 
-async def update_user(user_id: int, data: dict):
+async def update_user(user_id: int, data: dict) -> list[int]:
+    """
+    Обновляет пользователя. Возвращает ID чатов, в инбоксах которых сменилось
+    имя отправителя (пусто, если имя не менялось) — их нужно убрать из кэша сообщений.
+    """
     async with engine.begin() as conn:
+        result = await conn.execute(
+            select(Users.c.username).where(Users.c.user_id == user_id).with_for_update()
+        )
+        old_username = result.scalar()
         await conn.execute(update(Users).where(Users.c.user_id == user_id).values(**data))
+        await conn.execute(bump_user_chats_version(user_id))
+        if "username" not in data or data["username"] == old_username:
+            return []
+
+        # Имя отправителя денормализовано в UserInbox
+        result = await conn.execute(
+            select(UserInbox.c.chat_id).distinct().where(UserInbox.c.sender_id == user_id)
+        )
+        chat_ids = [row.chat_id for row in result]
+        await conn.execute(
+            update(UserInbox)
+            .where(UserInbox.c.sender_id == user_id)
+            .where(UserInbox.c.sender_username != data["username"])
+            .values(sender_username=data["username"])
+        )
+        return chat_ids
 
 
 async def delete_user(user_id: int):
@@ -0,0 +1,77 @@
+from sqlalchemy import select, update, func
+from app.database.db import engine
+from app.database.models import Chats, ChatMembers, UserInbox
+
+
+def bump_members_version(chat_id: int):
+    return update(Chats).where(Chats.c.chat_id == chat_id).values(members_version=Chats.c.members_version + 1)
+
+
+def bump_user_chats_version(user_id: int):
+    """
+    Профиль пользователя виден в участниках всех его чатов. Вызывается при любом
+    UPDATE Users: last_seen меняется через onupdate, даже если поле не передано.
+
+    Строки Chats блокируются по возрастанию chat_id (ORDER BY ... FOR UPDATE в
+    подзапросе) — в том же порядке, что и при запечатывании блока, иначе UPDATE по
+    IN(...) в произвольном порядке может взаимно заблокироваться с ним.
+    """
+    locked = (
+        select(Chats.c.chat_id)
+        .where(Chats.c.chat_id.in_(select(ChatMembers.c.chat_id).where(ChatMembers.c.user_id == user_id)))
+        .order_by(Chats.c.chat_id)
+        .with_for_update()
+    )
+    return (
+        update(Chats)
+        .where(Chats.c.chat_id.in_(locked))
+        .values(members_version=Chats.c.members_version + 1)
+    )
+
+
+async def get_chat_list_versions(user_id: int):
+    """(chat_id, last_transaction_id, маркер прочтения, unread_count) по всем чатам пользователя."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(
+                Chats.c.chat_id,
+                Chats.c.last_transaction_id,
+                ChatMembers.c.last_read_transaction_id,
+                ChatMembers.c.unread_count,
+            )
+            .select_from(Chats.join(ChatMembers, Chats.c.chat_id == ChatMembers.c.chat_id))
+            .where(ChatMembers.c.user_id == user_id)
+            .order_by(Chats.c.chat_id)
+        )
+        return result.fetchall()
+
+
+async def get_members_version(chat_id: int, user_id: int) -> int | None:
+    """members_version чата; None — пользователь не участник."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(Chats.c.members_version)
+            .select_from(Chats.join(ChatMembers, Chats.c.chat_id == ChatMembers.c.chat_id))
+            .where(ChatMembers.c.chat_id == chat_id, ChatMembers.c.user_id == user_id)
+        )
+        return result.scalar()
+
+
+async def get_messages_version(chat_id: int, user_id: int):
+    """
+    (members_version, последний seq инбокса пользователя в чате) или None, если
+    пользователь не участник. members_version входит в версию, потому что в
+    сообщениях есть имя отправителя.
+    """
+    last_seq = (
+        select(func.max(UserInbox.c.seq))
+        .where(UserInbox.c.user_id == user_id, UserInbox.c.chat_id == chat_id)
+        .scalar_subquery()
+    )
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(Chats.c.members_version, last_seq.label("last_seq"))
+            .select_from(Chats.join(ChatMembers, Chats.c.chat_id == ChatMembers.c.chat_id))
+            .where(ChatMembers.c.chat_id == chat_id, ChatMembers.c.user_id == user_id)
+        )
+        return result.fetchone()
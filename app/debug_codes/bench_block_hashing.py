@@ -0,0 +1,49 @@
+"""
+Микробенчмарк хеширования: legacy JSON (calculate_hash) против бинарного кодирования v1.
+
+    python -m app.debug_codes.bench_block_hashing
+"""
+import timeit
+from base64 import b64encode
+from os import urandom
+
+from app.utils.blockchain import (
+    generate_block_data,
+    hash_block,
+    hash_payload,
+    HASH_VERSION_LEGACY_JSON,
+    HASH_VERSION_BINARY,
+)
+
+NUMBER = 20000
+PAYLOAD_SIZES = [256, 4096, 65536]
+
+
+def bench(label: str, legacy, binary, number: int = NUMBER):
+    legacy_us = min(timeit.repeat(legacy, number=number, repeat=5)) / number * 1e6
+    binary_us = min(timeit.repeat(binary, number=number, repeat=5)) / number * 1e6
+    print(f"{label:<28} | {legacy_us:>10.2f} | {binary_us:>10.2f} | {legacy_us / binary_us:>8.1f}x")
+
+
+def main():
+    header = generate_block_data(urandom(32).hex(), 123456, 42, chat_id=7, merkle_root=urandom(32).hex())
+
+    print(f"{'':<28} | {'JSON, мкс':>10} | {'v1, мкс':>10} | {'ускорение':>9}")
+    print("-" * 67)
+    bench(
+        "заголовок блока",
+        lambda: hash_block(header, HASH_VERSION_LEGACY_JSON),
+        lambda: hash_block(header, HASH_VERSION_BINARY),
+    )
+    for size in PAYLOAD_SIZES:
+        encrypted = b64encode(urandom(size)).decode()
+        bench(
+            f"payload {size} байт",
+            lambda: hash_payload(encrypted, HASH_VERSION_LEGACY_JSON),
+            lambda: hash_payload(encrypted, HASH_VERSION_BINARY),
+            number=max(NUMBER * 256 // size, 200),
+        )
+
+
+if __name__ == "__main__":
+    main()
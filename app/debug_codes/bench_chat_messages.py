@@ -0,0 +1,174 @@
+"""
+Регрессионный бенчмарк чтения истории чата: старый вариант из трёх запросов с
+группировкой транзакций в Python против чтения страницы из UserInbox
+(select_chat_messages_page).
+
+Создаёт временный групповой чат с собственной цепочкой блоков, заполняет его
+сообщениями и удаляет в конце (блоки и транзакции — каскадом вместе с чатом).
+Запускать только на тестовой базе.
+    python -m app.debug_codes.bench_chat_messages [--messages 20000] [--members 10]
+"""
+import argparse
+import asyncio
+import time
+from os import urandom
+from random import randint
+
+from sqlalchemy import select, insert, delete
+
+from app.database import blockchain as db_chain
+from app.database.db import engine
+from app.database.messages import select_chat_messages_page
+from app.database.models import (
+    Users, Chats, ChatMembers, BlockchainTransactions, BlockchainPayloads, UserInbox,
+)
+from app.utils.blockchain import hash_payload_bytes
+
+MESSAGES_PER_BLOCK = 1000
+PAGE_SIZE = 50
+ROUNDS = 5
+
+
+async def seed_chat(member_ids: list[int], message_count: int) -> tuple[int, list[str]]:
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            insert(Chats).values(chat_name="bench", chat_type="group", creator_user_id=member_ids[0])
+            .returning(Chats.c.chat_id)
+        )
+        chat_id = result.scalar()
+        await conn.execute(insert(ChatMembers), [{"chat_id": chat_id, "user_id": uid} for uid in member_ids])
+
+    payload_hashes = []
+    for start in range(0, message_count, MESSAGES_PER_BLOCK):
+        messages = []
+        for i in range(start, min(start + MESSAGES_PER_BLOCK, message_count)):
+            sender_id = member_ids[i % len(member_ids)]
+            transactions = []
+            for receiver_id in member_ids:
+                encrypted = urandom(64)
+                payload_hashes.append(hash_payload_bytes(encrypted))
+                transactions.append({
+                    "sender_id": sender_id,
+                    "receiver_id": receiver_id,
+                    "chat_id": chat_id,
+                    "payload_hash": payload_hashes[-1],
+                    "signature": urandom(256),
+                    "encrypted_data": encrypted,
+                })
+            messages.append(transactions)
+        await db_chain.create_block_with_transactions(randint(100000, 999999), None, messages, chat_id=chat_id)
+    return chat_id, payload_hashes
+
+
+async def legacy_full_history(chat_id: int, user_id: int) -> int:
+    """get_chat_messages до keyset-пагинации: вся история и второй проход по всем транзакциям чата."""
+    async with engine.connect() as conn:
+        tx_result = await conn.execute(
+            select(
+                BlockchainTransactions.c.transaction_id,
+                BlockchainTransactions.c.sender_id,
+                BlockchainTransactions.c.signature,
+                BlockchainTransactions.c.wrapped_key,
+                BlockchainTransactions.c.timestamp,
+                BlockchainPayloads.c.encrypted_data,
+                Users.c.username
+            )
+            .select_from(
+                BlockchainTransactions
+                .join(BlockchainPayloads, BlockchainTransactions.c.payload_hash == BlockchainPayloads.c.payload_hash)
+                .join(Users, BlockchainTransactions.c.sender_id == Users.c.user_id)
+            )
+            .where(
+                (BlockchainTransactions.c.chat_id == chat_id) &
+                (
+                    (BlockchainTransactions.c.receiver_id == user_id) |
+                    (BlockchainTransactions.c.sender_id == user_id)
+                )
+            )
+            .order_by(BlockchainTransactions.c.timestamp.asc())
+        )
+        tx_list = tx_result.fetchall()
+
+        all_tx_result = await conn.execute(
+            select(
+                BlockchainTransactions.c.transaction_id,
+                BlockchainTransactions.c.block_id,
+                BlockchainTransactions.c.message_index,
+                BlockchainTransactions.c.receiver_id
+            ).where(BlockchainTransactions.c.chat_id == chat_id)
+        )
+        all_tx_by_block = {}
+        for tx in all_tx_result.fetchall():
+            all_tx_by_block.setdefault((tx.block_id, tx.message_index), []).append(tx)
+
+        selected_tx_ids = set()
+        for group in all_tx_by_block.values():
+            preferred = next((tx for tx in group if tx.receiver_id == user_id), group[0])
+            selected_tx_ids.add(preferred.transaction_id)
+
+        return sum(1 for row in tx_list if row.transaction_id in selected_tx_ids)
+
+
+async def single_query_page(chat_id: int, user_id: int, cursor=None) -> int:
+    async with engine.connect() as conn:
+        result = await conn.execute(select_chat_messages_page(chat_id, user_id, PAGE_SIZE, "before", cursor))
+        return len(result.fetchall()[:PAGE_SIZE])
+
+
+async def measure(label: str, read) -> None:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        rows = await read()
+        timings.append(time.perf_counter() - started)
+    print(f"{label:<40} | {rows:>9} | {sorted(timings)[len(timings) // 2] * 1000:>10.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк чтения истории чата")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--members", type=int, default=10)
+    args = parser.parse_args()
+
+    engine.sync_engine.echo = False
+
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Users.c.user_id).limit(args.members))
+        member_ids = [row.user_id for row in result.fetchall()]
+
+    if not member_ids:
+        print("В базе нет пользователей — некого добавить в чат.")
+        return
+
+    chat_id, payload_hashes = None, []
+    try:
+        chat_id, payload_hashes = await seed_chat(member_ids, args.messages)
+        user_id = member_ids[0]
+
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(UserInbox.c.seq)
+                .where(UserInbox.c.user_id == user_id, UserInbox.c.chat_id == chat_id)
+                .order_by(UserInbox.c.seq)
+                .offset(args.messages // 2)
+                .limit(1)
+            )
+            middle = result.scalar()
+
+        print(f"Чат: {args.messages} сообщений × {len(member_ids)} участников = {len(payload_hashes)} транзакций\n")
+        print(f"{'':<40} | {'сообщений':>9} | {'мс':>10}")
+        print("-" * 66)
+        await measure("3 запроса, вся история", lambda: legacy_full_history(chat_id, user_id))
+        await measure("инбокс, последняя страница", lambda: single_query_page(chat_id, user_id))
+        await measure("инбокс, страница из середины", lambda: single_query_page(chat_id, user_id, middle))
+    finally:
+        if chat_id is not None:
+            # Блоки, транзакции и инбокс чата удаляются каскадом вместе с ним
+            async with engine.begin() as conn:
+                await conn.execute(delete(Chats).where(Chats.c.chat_id == chat_id))
+        await db_chain.delete_payloads(payload_hashes)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
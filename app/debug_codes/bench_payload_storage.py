@@ -0,0 +1,97 @@
+"""
+Бенчмарк хранения payload'ов: base64 в Text (как было) против сырых байт в bytea.
+
+Для каждого размера payload'а заполняет две временные таблицы одинаковыми данными
+и сравнивает их размер на диске (pg_total_relation_size) и время чтения страницы
+сообщений вместе с формированием JSON-ответа, как в get_chat_messages:
+для Text строки отдаются как есть, для bytea кодируются в base64 на границе API.
+
+Временные таблицы живут только в сессии скрипта, рабочие таблицы не трогаются.
+    python -m app.debug_codes.bench_payload_storage
+"""
+import asyncio
+import json
+import time
+from base64 import b64encode
+from os import urandom
+
+from sqlalchemy import text
+
+from app.database.db import engine
+from app.utils.blockchain import to_b64
+
+ROWS = 20000
+PAGE_SIZE = 500
+ROUNDS = 20
+PAYLOAD_SIZES = [256, 1024, 4096]
+SIGNATURE_SIZE = 256
+
+
+async def fill(conn, size: int):
+    await conn.execute(text("DROP TABLE IF EXISTS bench_payloads_text, bench_payloads_bytea"))
+    await conn.execute(text(
+        "CREATE TEMP TABLE bench_payloads_text (id bigserial PRIMARY KEY, signature text, encrypted_data text)"
+    ))
+    await conn.execute(text(
+        "CREATE TEMP TABLE bench_payloads_bytea (id bigserial PRIMARY KEY, signature bytea, encrypted_data bytea)"
+    ))
+
+    rows = [(urandom(SIGNATURE_SIZE), urandom(size)) for _ in range(ROWS)]
+    await conn.execute(
+        text("INSERT INTO bench_payloads_text (signature, encrypted_data) VALUES (:signature, :encrypted_data)"),
+        [{"signature": b64encode(sig).decode(), "encrypted_data": b64encode(data).decode()} for sig, data in rows]
+    )
+    await conn.execute(
+        text("INSERT INTO bench_payloads_bytea (signature, encrypted_data) VALUES (:signature, :encrypted_data)"),
+        [{"signature": sig, "encrypted_data": data} for sig, data in rows]
+    )
+    await conn.execute(text("ANALYZE bench_payloads_text"))
+    await conn.execute(text("ANALYZE bench_payloads_bytea"))
+
+
+async def table_size(conn, table: str) -> int:
+    result = await conn.execute(text(f"SELECT pg_total_relation_size('{table}')"))
+    return result.scalar()
+
+
+async def read_page_ms(conn, table: str, encode) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        result = await conn.execute(text(
+            f"SELECT id, signature, encrypted_data FROM {table} ORDER BY id DESC LIMIT {PAGE_SIZE}"
+        ))
+        messages = [
+            {"message_id": row.id, "signature": encode(row.signature), "encrypted_data": encode(row.encrypted_data)}
+            for row in result.fetchall()
+        ]
+        json.dumps({"messages": messages})
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+async def main():
+    engine.sync_engine.echo = False
+
+    print(f"{ROWS} строк, страница {PAGE_SIZE} сообщений\n")
+    print(f"{'payload':>8} | {'text, МБ':>9} | {'bytea, МБ':>9} | {'экономия':>8} | {'text, мс':>9} | {'bytea, мс':>9}")
+    print("-" * 68)
+    try:
+        async with engine.connect() as conn:
+            for size in PAYLOAD_SIZES:
+                await fill(conn, size)
+                text_size = await table_size(conn, "bench_payloads_text")
+                bytea_size = await table_size(conn, "bench_payloads_bytea")
+                text_ms = await read_page_ms(conn, "bench_payloads_text", lambda value: value)
+                bytea_ms = await read_page_ms(conn, "bench_payloads_bytea", to_b64)
+                print(
+                    f"{size:>8} | {text_size / 2**20:>9.2f} | {bytea_size / 2**20:>9.2f} "
+                    f"| {1 - bytea_size / text_size:>8.0%} | {text_ms:>9.2f} | {bytea_ms:>9.2f}"
+                )
+            await conn.rollback()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Бенчмарк записи группового сообщения: старый путь (по транзакции БД на каждую
+запись) против create_block_with_transactions (одна транзакция БД на сообщение).
+
+Запускать только на тестовой базе: скрипт пишет блоки в цепочку и удаляет их в конце.
+    python -m app.debug_codes.bench_send_message
+"""
+import asyncio
+import time
+from os import urandom
+from random import randint
+
+from sqlalchemy import select, delete
+
+from app.database import blockchain as db_chain
+from app.database.db import engine
+from app.database.models import Users, BlockchainBlocks, BlockchainPayloads
+from app.utils.blockchain import hash_payload_bytes
+
+GROUP_SIZES = [1, 10, 50, 200]
+ROUNDS = 5
+
+
+def make_transactions(sender_id: int, receiver_ids: list[int]) -> list[dict]:
+    transactions = []
+    for receiver_id in receiver_ids:
+        encrypted = urandom(256)
+        transactions.append({
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "chat_id": None,
+            "payload_hash": hash_payload_bytes(encrypted),
+            "signature": urandom(256),
+            "encrypted_data": encrypted,
+        })
+    return transactions
+
+
+async def send_per_row(transactions: list[dict]) -> int:
+    last_block = await db_chain.get_last_block()
+    prev_hash = last_block.block_hash if last_block else "0" * 64
+    block_id, _ = await db_chain.create_block(prev_hash, randint(100000, 999999), transactions[0]["sender_id"])
+    for tx in transactions:
+        await db_chain.store_encrypted_payload(tx["encrypted_data"], tx["payload_hash"])
+        await db_chain.add_transaction(
+            block_id=block_id,
+            sender_id=tx["sender_id"],
+            receiver_id=tx["receiver_id"],
+            chat_id=tx["chat_id"],
+            payload_hash=tx["payload_hash"],
+            signature=tx["signature"],
+        )
+    return block_id
+
+
+async def send_bulk(transactions: list[dict]) -> int:
+    block_id, _, _, _ = await db_chain.create_block_with_transactions(
+        randint(100000, 999999), transactions[0]["sender_id"], [transactions]
+    )
+    return block_id
+
+
+async def measure(send, transactions: list[dict], created_blocks: list[int]) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        created_blocks.append(await send(transactions))
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+async def main():
+    engine.sync_engine.echo = False
+
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Users.c.user_id).limit(max(GROUP_SIZES)))
+        user_ids = [row.user_id for row in result.fetchall()]
+
+    if not user_ids:
+        print("В базе нет пользователей — нечего использовать как отправителя/получателей.")
+        return
+
+    created_blocks = []
+    created_payloads = []
+    print(f"{'участников':>10} | {'по строке, мс':>14} | {'bulk, мс':>9} | {'ускорение':>9}")
+    print("-" * 52)
+    try:
+        for size in GROUP_SIZES:
+            receiver_ids = [user_ids[i % len(user_ids)] for i in range(size)]
+            transactions = make_transactions(user_ids[0], receiver_ids)
+            created_payloads.extend(tx["payload_hash"] for tx in transactions)
+
+            per_row_ms = await measure(send_per_row, transactions, created_blocks)
+            bulk_ms = await measure(send_bulk, transactions, created_blocks)
+            print(f"{size:>10} | {per_row_ms:>14.2f} | {bulk_ms:>9.2f} | {per_row_ms / bulk_ms:>8.1f}x")
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(BlockchainBlocks).where(BlockchainBlocks.c.block_id.in_(created_blocks)))
+            await conn.execute(delete(BlockchainPayloads).where(BlockchainPayloads.c.payload_hash.in_(created_payloads)))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Микробенчмарк сериализации ответов по маршрутам: marshmallow Schema().dump + stdlib
+json (как было) против собранных сериализаторов + выбранного кодировщика
+(JSON_ENCODER) и MessagePack. База не нужна — строки ответа генерируются.
+
+    python -m app.debug_codes.bench_serialization [--chats 300] [--messages 50] [--payload 4096]
+"""
+import argparse
+import json
+import timeit
+from base64 import b64encode
+from datetime import datetime, timedelta
+from os import urandom
+
+from app.config import settings
+from app.schemas.chats import ChatListSchema
+from app.utils.blockchain import to_b64
+from app.utils.responses import encode_json, packb
+from app.utils.serializers import compile_schema
+
+REPEAT = 5
+
+
+def chat_rows(count: int) -> list[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "chat_id": i,
+            "chat_type": "group" if i % 3 else "private",
+            "chat_name": f"chat {i}",
+            "last_message_time": (now - timedelta(minutes=i)).isoformat(),
+            "unread_count": i % 7,
+            "last_read_message_id": 1000 + i,
+        }
+        for i in range(count)
+    ]
+
+
+def message_items(count: int, payload_size: int) -> list[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "message_id": 5000 + i,
+            "from_user_id": i % 10,
+            "from_username": f"user{i % 10}",
+            "encrypted_data": urandom(payload_size),
+            "wrapped_key": urandom(256),
+            "signature": urandom(256),
+            "timestamp": (now + timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def members(count: int) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "username": f"user{i}",
+            "public_key": b64encode(urandom(294)).decode(),
+            "last_seen": datetime.utcnow().isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def bench(label: str, variants: dict) -> None:
+    timings = {}
+    for name, fn in variants.items():
+        number = max(1, int(0.2 / max(timeit.timeit(fn, number=1), 1e-7)))
+        timings[name] = (min(timeit.repeat(fn, number=number, repeat=REPEAT)) / number * 1e6, len(fn()))
+    base_us, _ = timings["было"]
+    for name, (us, size) in timings.items():
+        print(f"{label:<18} | {name:<12} | {us:>10.1f} | {base_us / us:>7.1f}x | {size:>9}")
+    print("-" * 68)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации ответов")
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--payload", type=int, default=4096)
+    args = parser.parse_args()
+
+    serialize_chat_list = compile_schema(ChatListSchema)
+    chats = {"chats": chat_rows(args.chats)}
+    items = message_items(args.messages, args.payload)
+    page = {"messages": items, "next_cursor": "MTIz", "has_more": True}
+    member_list = {"members": members(args.chats // 10 or 1)}
+
+    def legacy_page():
+        return json.dumps({**page, "messages": [
+            {**item, **{key: to_b64(item[key]) for key in ("encrypted_data", "wrapped_key", "signature")}}
+            for item in items
+        ]})
+
+    print(f"Кодировщик JSON: {settings.JSON_ENCODER}\n")
+    print(f"{'маршрут':<18} | {'вариант':<12} | {'мкс':>10} | {'ускор.':>8} | {'байт':>9}")
+    print("-" * 68)
+    bench("список чатов", {
+        "было": lambda: json.dumps(ChatListSchema().dump(chats)),
+        "JSON": lambda: encode_json(serialize_chat_list(chats)),
+        "MessagePack": lambda: packb(serialize_chat_list(chats)),
+    })
+    bench("участники", {
+        "было": lambda: json.dumps(member_list),
+        "JSON": lambda: encode_json(member_list),
+        "MessagePack": lambda: packb(member_list),
+    })
+    bench("страница сообщ.", {
+        "было": legacy_page,
+        "JSON": lambda: encode_json(page),
+        "MessagePack": lambda: packb(page),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Пропускная способность проверки RSA-PSS подписей: в одном процессе и через пул
+SignatureVerifier с разным числом процессов (одна задача пула на батч).
+
+    python -m app.debug_codes.bench_signature_verification
+"""
+import asyncio
+import os
+import time
+from base64 import b64encode
+from os import urandom
+
+from app.utils.blockchain import generate_key_pair, sign_message
+from app.utils.signature_verifier import SignatureVerifier, verify_batch
+
+SIGNATURES = 2000
+BATCH_SIZE = 50
+
+
+def make_items(count: int) -> list[tuple[str, str, str]]:
+    private_pem, public_pem = generate_key_pair()
+    items = []
+    for _ in range(count):
+        message = b64encode(urandom(256)).decode()
+        items.append((message, sign_message(message, private_pem), public_pem))
+    return items
+
+
+def report(label: str, count: int, elapsed: float, cores: int):
+    per_sec = count / elapsed
+    print(f"{label:<24} | {per_sec:>10.0f} | {per_sec / cores:>10.0f}")
+
+
+async def bench_pool(items: list[tuple[str, str, str]], workers: int) -> float:
+    verifier = SignatureVerifier(mode="strict", workers=workers)
+    verifier.start()
+    # Прогрев: запуск процессов и разбор ключа в каждом из них
+    await asyncio.gather(*[verifier.verify(items[:1]) for _ in range(workers)])
+
+    batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*[verifier.verify(batch) for batch in batches])
+    elapsed = time.perf_counter() - start
+    await verifier.stop()
+
+    assert all(all(verdicts) for verdicts in results)
+    return elapsed
+
+
+async def main():
+    items = make_items(SIGNATURES)
+
+    print(f"{'':<24} | {'подп./с':>10} | {'на ядро':>10}")
+    print("-" * 50)
+
+    verify_batch(items[:1])
+    start = time.perf_counter()
+    assert all(verify_batch(items))
+    report("inline, 1 процесс", len(items), time.perf_counter() - start, 1)
+
+    cpu_count = os.cpu_count() or 1
+    workers = 1
+    while workers <= cpu_count:
+        elapsed = await bench_pool(items, workers)
+        report(f"пул, {workers} процесс(ов)", len(items), elapsed, workers)
+        workers *= 2
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
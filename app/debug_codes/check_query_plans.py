@@ -0,0 +1,166 @@
+"""
+Проверка планов горячих запросов: падает (код выхода 1), если какой-то из них
+читает большую таблицу последовательным сканированием вместо индекса.
+
+Засевает временный чат с историей сообщений и refresh-токены, делает ANALYZE,
+снимает EXPLAIN (FORMAT JSON) каждого запроса и ищет в плане узлы Seq Scan по
+таблицам из WATCHED_TABLES. Маленькие таблицы (Users, ChatMembers) не проверяются:
+на них последовательное сканирование — нормальный выбор планировщика.
+Засеянные данные удаляются в конце. Запускать только на тестовой базе.
+    python -m app.debug_codes.check_query_plans [--messages 20000] [--members 10]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+from secrets import token_urlsafe
+
+from sqlalchemy import select, insert, update, delete, text
+from sqlalchemy.dialects import postgresql
+
+from app.database import blockchain as db_chain
+from app.database.db import engine
+from app.database.messages import select_chat_messages_page
+from app.database.models import (
+    Users, Chats, BlockchainBlocks, BlockchainTransactions, RefreshTokens, UserInbox,
+)
+from app.debug_codes.bench_chat_messages import seed_chat
+
+WATCHED_TABLES = {"BlockchainTransactions", "BlockchainPayloads", "BlockchainBlocks", "RefreshTokens", "UserInbox"}
+REFRESH_TOKENS = 20000
+
+
+def seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in WATCHED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def explain(conn, stmt) -> dict:
+    sql = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def hot_queries(chat_id: int, user_id: int, block_id: int, cursor: int, device_id: str, token: str) -> dict:
+    return {
+        "сообщения чата: последняя страница": select_chat_messages_page(chat_id, user_id, 50),
+        "сообщения чата: страница по курсору": select_chat_messages_page(chat_id, user_id, 50, "before", cursor),
+        "Merkle-доказательство: транзакции блока": (
+            select(BlockchainTransactions.c.transaction_id, BlockchainTransactions.c.payload_hash)
+            .where(BlockchainTransactions.c.block_id == block_id)
+            .order_by(BlockchainTransactions.c.transaction_id)
+        ),
+        "голова цепочки чата": (
+            select(BlockchainBlocks.c.block_hash)
+            .where(BlockchainBlocks.c.chat_id == chat_id)
+            .order_by(BlockchainBlocks.c.block_id.desc())
+            .limit(1)
+        ),
+        "refresh: поиск токена": (
+            select(RefreshTokens)
+            .where(RefreshTokens.c.token == token)
+            .where(RefreshTokens.c.device_id == device_id)
+            .where(RefreshTokens.c.is_revoked == False)
+            .where(RefreshTokens.c.expires_at > datetime.utcnow())
+        ),
+        "refresh: отзыв токенов устройства": (
+            update(RefreshTokens)
+            .where(RefreshTokens.c.user_id == user_id)
+            .where(RefreshTokens.c.device_id == device_id)
+            .where(RefreshTokens.c.is_revoked == False)
+            .values(is_revoked=True)
+        ),
+    }
+
+
+async def cleanup(chat_id: int | None, payload_hashes: list[str], device_prefix: str):
+    async with engine.begin() as conn:
+        # Блоки, транзакции и инбокс чата удаляются каскадом вместе с ним
+        if chat_id is not None:
+            await conn.execute(delete(Chats).where(Chats.c.chat_id == chat_id))
+        await conn.execute(delete(RefreshTokens).where(RefreshTokens.c.device_id.startswith(device_prefix)))
+    await db_chain.delete_payloads(payload_hashes)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Проверка планов горячих запросов")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--members", type=int, default=10)
+    args = parser.parse_args()
+
+    engine.sync_engine.echo = False
+
+    async with engine.connect() as conn:
+        result = await conn.execute(select(Users.c.user_id).limit(args.members))
+        member_ids = [row.user_id for row in result.fetchall()]
+
+    if not member_ids:
+        print("В базе нет пользователей — нечего засевать.")
+        return
+
+    user_id = member_ids[0]
+    chat_id, payload_hashes = None, []
+    device_prefix = f"plan-check-{token_urlsafe(6)}"
+    failed = []
+    try:
+        chat_id, payload_hashes = await seed_chat(member_ids, args.messages)
+
+        tokens = [
+            {
+                "user_id": user_id,
+                "token": token_urlsafe(48),
+                "device_id": f"{device_prefix}-{i % 500}",
+                "expires_at": datetime.utcnow() + timedelta(days=30),
+            }
+            for i in range(REFRESH_TOKENS)
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(RefreshTokens), tokens)
+            for table in sorted(WATCHED_TABLES):
+                await conn.execute(text(f'ANALYZE "{table}"'))
+
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(UserInbox.c.seq, BlockchainTransactions.c.block_id)
+                .select_from(UserInbox.join(BlockchainTransactions, UserInbox.c.transaction_id == BlockchainTransactions.c.transaction_id))
+                .where(UserInbox.c.user_id == user_id, UserInbox.c.chat_id == chat_id)
+                .order_by(UserInbox.c.seq)
+                .offset(args.messages // 2)
+                .limit(1)
+            )
+            middle = result.fetchone()
+
+            queries = hot_queries(
+                chat_id, user_id, middle.block_id, middle.seq,
+                tokens[0]["device_id"], tokens[0]["token"],
+            )
+            for label, stmt in queries.items():
+                scans = seq_scans(await explain(conn, stmt))
+                if scans:
+                    failed.append(label)
+                    print(f"❌ {label}: Seq Scan по {', '.join(sorted(set(scans)))}")
+                else:
+                    print(f"✅ {label}")
+    finally:
+        # Ошибка очистки не должна скрыть отчёт о планах выше
+        try:
+            await cleanup(chat_id, payload_hashes, device_prefix)
+        except Exception as e:
+            print(f"\n⚠️ Не удалось удалить засеянные данные (chat_id={chat_id}, device_id {device_prefix}-*): {e}")
+        await engine.dispose()
+
+    if failed:
+        print(f"\nПланы деградировали у {len(failed)} запросов")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,7 +3,7 @@ from pathlib import Path
 from datetime import datetime
 from datetime import datetime, timezone, timedelta
 
-from app.utils.blockchain import decrypt_message
+from app.utils.blockchain import decrypt_any, key_cache
 
 INPUT_PATH = Path("input.json")
 KEY_PATH = Path("private_key.pem")
@@ -48,12 +48,15 @@ def main():
         timestamp = format_timestamp(msg.get("timestamp", ""))
 
         try:
-            decrypted = decrypt_message(encrypted, private_key)
+            decrypted = decrypt_any(encrypted, msg.get("wrapped_key"), private_key)
         except Exception as e:
             decrypted = f"[Ошибка расшифровки: {e}]"
 
         print(f"[{timestamp}] от {from_user}: {decrypted}")
 
+    # Ключ разбирается один раз, остальные сообщения берут его из кэша
+    print("-" * 50 + f"\nКэш ключей: {key_cache.stats()}")
+
 
 if __name__ == "__main__":
     main()
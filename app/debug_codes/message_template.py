@@ -1,5 +1,6 @@
 import asyncio
 import json
+from base64 import b64decode
 from app.utils import blockchain
 from app.database.db import engine
 from app.database.models import UserKeys
@@ -8,7 +9,6 @@ from sqlalchemy import select
 
 async def generate_message_template(sender_id: int, receiver_ids: list[int], message: str, sender_priv_key: str) -> list[dict]:
     template = []
-    signature = blockchain.sign_message(message, sender_priv_key)
 
     async with engine.connect() as conn:
         for receiver_id in receiver_ids:
@@ -21,15 +21,43 @@ async def generate_message_template(sender_id: int, receiver_ids: list[int], mes
                 continue
 
             encrypted_message = blockchain.encrypt_message(message, receiver_key.public_key)
+            # Подписывается payload_hash шифртекста, а не сам текст — сервер хранит только шифртекст
+            payload_hash = blockchain.hash_payload_bytes(b64decode(encrypted_message))
             template.append({
                 "receiver_id": receiver_id,
                 "encrypted_message": encrypted_message,
-                "signature": signature
+                "signature": blockchain.sign_message(blockchain.signed_content(payload_hash), sender_priv_key)
             })
 
     return template
 
 
+async def generate_group_message_template(receiver_ids: list[int], message: str, sender_priv_key: str) -> dict:
+    """Шаблон в гибридном формате: один шифртекст и по обёрнутому ключу на получателя."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(UserKeys).where(UserKeys.c.user_id.in_(receiver_ids))
+        )
+        public_keys = {row.user_id: row.public_key for row in result.fetchall()}
+
+    for receiver_id in set(receiver_ids) - public_keys.keys():
+        print(f"⚠️ Публичный ключ для user_id={receiver_id} не найден — пропущен.")
+
+    ciphertext, wrapped_keys = blockchain.encrypt_hybrid(message, public_keys)
+    signed = blockchain.signed_content(
+        blockchain.hash_payload_bytes(b64decode(ciphertext)),
+        {receiver_id: b64decode(wrapped_key) for receiver_id, wrapped_key in wrapped_keys.items()},
+    )
+    return {
+        "ciphertext": ciphertext,
+        "signature": blockchain.sign_message(signed, sender_priv_key),
+        "keys": [
+            {"receiver_id": receiver_id, "wrapped_key": wrapped_key}
+            for receiver_id, wrapped_key in wrapped_keys.items()
+        ],
+    }
+
+
 if __name__ == "__main__":
     sender_id = 2
     receiver_ids = [1, sender_id]
@@ -70,6 +98,7 @@ uVvblbC3NfSqVgiBVFjfO+PFVLdfc/3f+G2iziSBaf/8kGZK9d2rZxMtmw7f+GIZ
         )
         print("\n📦 Скопируй это в Swagger `/chats/{chat_id}/send`:\n")
         print(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"\nКэш ключей: {blockchain.key_cache.stats()}")
     except Exception as e:
         print(f"\n❌ Ошибка: {e}")
 
@@ -6,10 +6,15 @@ from app.routes.auth import routes as auth_routes
 from app.routes.users import setup_user_routes
 from app.routes.chats import setup_chat_routes
 from app.routes.websocket import setup_websocket_routes
+from app.routes.blockchain import setup_blockchain_routes
 from app.routes.s3_demo import routes as s3_demo_routes
 
 from app.config import settings
 from app.database.db import engine
+from app.database import blockchain as db_chain
+from app.utils.block_producer import block_producer
+from app.utils.signature_verifier import signature_verifier
+from app.utils.chain_verifier import verification_runner
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,10 +22,16 @@ logger = logging.getLogger(__name__)
 
 async def on_startup(app: web.Application):
     logger.info("Starting up...")
+    await db_chain.load_chain_head()
+    block_producer.start()
+    signature_verifier.start()
 
 
 async def on_cleanup(app: web.Application):
     logger.info("Cleaning up...")
+    await verification_runner.stop()
+    await block_producer.stop()
+    await signature_verifier.stop()
 
 
 def create_app() -> web.Application:
@@ -41,6 +52,8 @@ def create_app() -> web.Application:
 
     setup_websocket_routes(app)
 
+    setup_blockchain_routes(app)
+
     async def health(request):
         return web.json_response({"status": "ok"})
 
@@ -0,0 +1,97 @@
+from aiohttp import web
+from aiohttp_apispec import docs, response_schema
+
+from app.database import blockchain as db_chain
+from app.database import users as db_users
+from app.schemas.blockchain import MerkleProofResponseSchema, ChainVerificationStatusSchema
+from app.utils.auth import get_jwt_payload
+from app.utils.blockchain import block_header, merkle_proof
+from app.utils.chain_verifier import verification_runner
+
+
+@docs(
+    tags=["Blockchain"],
+    summary="Merkle-доказательство включения транзакции в блок",
+    description="Позволяет клиенту проверить одно сообщение по O(log n) хешам, не скачивая содержимое блока"
+)
+@response_schema(MerkleProofResponseSchema, 200)
+async def get_transaction_proof(request: web.Request):
+    jwt_payload = get_jwt_payload(request)
+    user_id = int(jwt_payload["sub"])
+    transaction_id = int(request.match_info["transaction_id"])
+
+    tx = await db_chain.get_transaction_with_block(transaction_id)
+    if not tx or user_id not in (tx.sender_id, tx.receiver_id):
+        raise web.HTTPNotFound(text="Транзакция не найдена")
+
+    if tx.merkle_root is None:
+        raise web.HTTPNotFound(text="Блок создан до появления Merkle-корней, доказательство недоступно")
+
+    leaves = await db_chain.get_block_transaction_hashes(tx.block_id)
+    leaf_index = next(i for i, (tx_id, _) in enumerate(leaves) if tx_id == transaction_id)
+
+    header = block_header(tx)
+    header["timestamp"] = str(header["timestamp"])
+
+    return web.json_response({
+        "transaction_id": transaction_id,
+        "block_id": tx.block_id,
+        "block_hash": tx.block_hash,
+        "block_header": header,
+        "hash_version": tx.hash_version,
+        "payload_hash": tx.payload_hash,
+        "leaf_index": leaf_index,
+        "proof": merkle_proof([payload_hash for _, payload_hash in leaves], leaf_index),
+    })
+
+
+@docs(
+    tags=["Blockchain"],
+    summary="Запустить проверку целостности цепочки (только для админов)",
+    description=(
+        "Проверка идёт в фоне, ответ 202 приходит сразу; результат — GET /blockchain/verify. "
+        "Инкрементально: проверяются блоки после сохранённого checkpoint. ?full=true — вся цепочка, "
+        "?chat_id=<id> — только цепочка этого чата (со своим checkpoint)"
+    ),
+    parameters=[
+        {"in": "query", "name": "full", "schema": {"type": "boolean", "default": False}},
+        {"in": "query", "name": "chat_id", "schema": {"type": "integer"}},
+    ]
+)
+@response_schema(ChainVerificationStatusSchema, 202)
+async def verify_blockchain(request: web.Request):
+    await require_admin(request)
+
+    full = request.query.get("full", "").lower() in ("1", "true")
+    try:
+        chat_id = int(request.query["chat_id"]) if "chat_id" in request.query else None
+    except ValueError:
+        raise web.HTTPBadRequest(text="chat_id должен быть числом")
+
+    if not verification_runner.start(full=full, chat_id=chat_id):
+        raise web.HTTPConflict(text="Проверка цепочки уже выполняется")
+
+    return web.json_response(verification_runner.status(), status=202)
+
+
+@docs(
+    tags=["Blockchain"],
+    summary="Состояние и отчёт последней проверки цепочки (только для админов)",
+)
+@response_schema(ChainVerificationStatusSchema, 200)
+async def get_verification_status(request: web.Request):
+    await require_admin(request)
+    return web.json_response(verification_runner.status())
+
+
+async def require_admin(request: web.Request):
+    jwt_payload = get_jwt_payload(request)
+    user_id = int(jwt_payload["sub"])
+    if not await db_users.is_admin(user_id):
+        raise web.HTTPForbidden(text="Only admin can verify the blockchain")
+
+
+def setup_blockchain_routes(app: web.Application):
+    app.router.add_get("/blockchain/transactions/{transaction_id}/proof", get_transaction_proof, allow_head=False)
+    app.router.add_post("/blockchain/verify", verify_blockchain)
+    app.router.add_get("/blockchain/verify", get_verification_status, allow_head=False)
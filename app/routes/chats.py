@@ -1,15 +1,15 @@
 from aiohttp import web
 from datetime import datetime
+from base64 import b64decode
 from aiohttp_apispec import docs, request_schema, response_schema
-from sqlalchemy import select, insert, func
+from marshmallow import Schema, ValidationError, EXCLUDE
+from sqlalchemy import select, insert
 from app.database.db import engine
 from app.database.models import (
     Users,
     Chats,
     ChatMembers,
     ChatUserRoles,
-    BlockchainTransactions,
-    BlockchainPayloads,
     UserKeys,
 )
 from app.utils.auth import get_jwt_payload, decode_access_token
@@ -19,32 +19,56 @@ from app.schemas.chats import (
     ChatResponseSchema,
     ChatListSchema,
     ChatAddMemberSchema,
-    ChatMembersResponseSchema
+    ChatMembersResponseSchema,
+    ChatReadSchema,
+    ChatReadResponseSchema
 )
 from app.schemas.messages import (
-    SendMessageSchema,
-    SendMessageResponseSchema,
-    InboxMessageSchema,
     EncryptedPerUserSchema,
     EncryptedBroadcastListSchema,
-    ChatMessageSchema,
-    ChatMessageListSchema
+    EncryptedGroupMessageSchema,
+    ChatMessageListSchema,
+    SyncResponseSchema
 )
 
-from app.utils.blockchain import (
-    verify_signature,
-    generate_block_data,
-    calculate_hash,
-    encrypt_message,
-    decrypt_message
-)
+from app.utils.blockchain import hash_payload_bytes, signed_content
 from app.database import users as db_users
-from app.database import blockchain as db_chain
-
-from random import randint
+from app.database import messages as db_messages
+from app.database import versions as db_versions
+from app.database import sync as db_sync
+from app.utils.block_producer import block_producer
+from app.utils.signature_verifier import signature_verifier
+from app.utils.message_cache import message_cache
+from app.utils.pagination import (
+    parse_page_params, encode_cursor, encode_sync_token, decode_sync_token, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+)
+from app.utils.streaming import wants_stream, stream_json_list, STREAM_CHUNK_SIZE
+from app.utils.etag import make_etag, etag_headers, check_not_modified
+from app.utils.responses import render, response_format
+from app.utils.serializers import compile_schema
 
 from app.routes.websocket import notify_chat_updated, notify_message
 
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def load_body(schema: Schema, body):
+    """Проверка тела запроса схемой; 400 с ошибками по полям вместо KeyError/TypeError в обработчике."""
+    try:
+        return schema.load(body)
+    except ValidationError as e:
+        raise web.HTTPBadRequest(text=f"Неверный формат запроса: {e.messages}")
+
+
+def decode_b64_field(value, field: str) -> bytes:
+    """base64 из запроса -> сырые байты для bytea-колонок; 400 при неверном формате."""
+    try:
+        return b64decode(value, validate=True)
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(text=f"{field} должен быть строкой base64")
+
 
 async def get_current_user_id(request: web.Request) -> int:
     token = request.headers.get("Authorization", "").split("Bearer ")[-1]
@@ -117,6 +141,7 @@ async def create_chat(request: web.Request):
             })
 
         await conn.execute(insert(ChatMembers), members_to_insert)
+        await db_sync.record_membership_events(conn, chat_id, [m["user_id"] for m in members_to_insert], "joined")
 
         # Присвоение роли "admin"
         await conn.execute(
@@ -130,57 +155,85 @@ async def create_chat(request: web.Request):
     return web.json_response({"chat_id": chat_id}, status=201)
 
 
-@docs(tags=["chats"], summary="Получить список чатов текущего пользователя с датой последнего сообщения")
+# Сериализаторы горячих схем собираются один раз при импорте
+serialize_chat = compile_schema(ChatResponseSchema)
+serialize_chat_list = compile_schema(ChatListSchema)
+
+
+def _chat_list_item(row) -> dict:
+    chat_type = row.chat_type
+    last_time = row.last_message_time
+
+    if isinstance(last_time, str):
+        try:
+            last_time = datetime.fromisoformat(last_time)
+        except ValueError:
+            pass
+
+    chat_data = {
+        "chat_id": row.chat_id,
+        "chat_type": chat_type,
+        "last_message_time": last_time.isoformat() if isinstance(last_time, datetime) else last_time,
+        "unread_count": row.unread_count,
+        "last_read_message_id": row.last_read_transaction_id
+    }
+
+    if chat_type == "private":
+        chat_data["chat_name"] = row.display_name
+    else:
+        chat_data["chat_name"] = row.chat_name
+
+    return chat_data
+
+
+@docs(
+    tags=["chats"],
+    summary="Получить список чатов текущего пользователя с датой последнего сообщения",
+    description=(
+        "?stream=true — ответ отдаётся потоком, чтение из серверного курсора. "
+        "Поддерживает If-None-Match: 304, если ни в одном чате не было новых сообщений"
+    )
+)
 @response_schema(ChatListSchema, 200)
 async def get_user_chats(request: web.Request):
     jwt_payload = get_jwt_payload(request)
     user_id = int(jwt_payload["sub"])
 
-    async with engine.connect() as conn:
-        result = await conn.execute(
-            select(
-                Chats.c.chat_id,
-                Chats.c.chat_type,
-                Chats.c.chat_name,
-                ChatMembers.c.display_name,
-                func.max(BlockchainTransactions.c.timestamp).label("last_message_time")
-            )
-            .select_from(
-                Chats
-                .join(ChatMembers, Chats.c.chat_id == ChatMembers.c.chat_id)
-                .outerjoin(BlockchainTransactions, Chats.c.chat_id == BlockchainTransactions.c.chat_id)
-            )
-            .where(ChatMembers.c.user_id == user_id)
-            .group_by(Chats.c.chat_id, Chats.c.chat_type, Chats.c.chat_name, ChatMembers.c.display_name)
-            .order_by(func.max(BlockchainTransactions.c.timestamp).desc())
+    # Версия списка — набор чатов, последняя транзакция и маркер прочтения в каждом
+    versions = await db_versions.get_chat_list_versions(user_id)
+    etag = make_etag(user_id, response_format(request), *(
+        f"{row.chat_id}:{row.last_transaction_id}:{row.last_read_transaction_id}:{row.unread_count}" for row in versions
+    ))
+    check_not_modified(request, etag)
+
+    query = (
+        select(
+            Chats.c.chat_id,
+            Chats.c.chat_type,
+            Chats.c.chat_name,
+            ChatMembers.c.display_name,
+            ChatMembers.c.unread_count,
+            ChatMembers.c.last_read_transaction_id,
+            Chats.c.last_message_at.label("last_message_time")
         )
+        .select_from(Chats.join(ChatMembers, Chats.c.chat_id == ChatMembers.c.chat_id))
+        .where(ChatMembers.c.user_id == user_id)
+        .order_by(Chats.c.last_message_at.desc())
+    )
+
+    if wants_stream(request):
+        async with engine.connect() as conn:
+            result = await conn.stream(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+            return await stream_json_list(
+                request, "chats", result, lambda row: serialize_chat(_chat_list_item(row)),
+                headers=etag_headers(etag),
+            )
 
-        chats = []
-        for row in result.fetchall():
-            chat_type = row.chat_type
-            last_time = row.last_message_time
-
-            if isinstance(last_time, str):
-                try:
-                    last_time = datetime.fromisoformat(last_time)
-                except ValueError:
-                    pass
-
-            chat_data = {
-                "chat_id": row.chat_id,
-                "chat_type": chat_type,
-                "last_message_time": last_time.isoformat() if isinstance(last_time, datetime) else last_time
-            }
-
-            if chat_type == "private":
-                chat_data["chat_name"] = row.display_name
-            else:
-                chat_data["chat_name"] = row.chat_name
-
-            chats.append(chat_data)
+    async with engine.connect() as conn:
+        result = await conn.execute(query)
+        chats = [_chat_list_item(row) for row in result.fetchall()]
 
-    schema = ChatListSchema()
-    return web.json_response(schema.dump({"chats": chats}))
+    return render(request, serialize_chat_list({"chats": chats}), headers=etag_headers(etag))
 
 
 @docs(tags=["chats"], summary="Получить информацию о конкретном чате")
@@ -222,8 +275,7 @@ async def get_chat_info(request: web.Request):
     # Удаляем display_name из ответа (не входит в схему)
     chat_dict.pop("display_name", None)
 
-    schema = ChatResponseSchema()
-    return web.json_response(schema.dump(chat_dict))
+    return render(request, serialize_chat(chat_dict))
 
 
 @docs(tags=["chats"], summary="Добавить участника в чат (group, channel, или второй участник private-чата)")
@@ -272,6 +324,8 @@ async def add_chat_member(request: web.Request):
                 user_id=new_user_id
             )
         )
+        await conn.execute(db_versions.bump_members_version(chat_id))
+        await db_sync.record_membership_events(conn, chat_id, [new_user_id], "joined")
 
     return web.json_response({"message": "Пользователь добавлен"})
 
@@ -279,7 +333,10 @@ async def add_chat_member(request: web.Request):
 @docs(
     tags=["chats"],
     summary="Получить список участников чата",
-    description="Возвращает список участников с их username, public_key и last_seen"
+    description=(
+        "Возвращает список участников с их username, public_key и last_seen. "
+        "Поддерживает If-None-Match: 304, если состав и профили участников не менялись"
+    )
 )
 @response_schema(ChatMembersResponseSchema, 200)
 async def get_chat_members(request: web.Request):
@@ -289,17 +346,15 @@ async def get_chat_members(request: web.Request):
 
     chat_id = int(request.match_info["chat_id"])
 
-    async with engine.connect() as conn:
-        # Проверка: является ли пользователь участником чата
-        result = await conn.execute(
-            select(ChatMembers).where(
-                (ChatMembers.c.chat_id == chat_id) &
-                (ChatMembers.c.user_id == current_user_id)
-            )
-        )
-        if not result.fetchone():
-            raise web.HTTPForbidden(text="Вы не участник этого чата")
+    # Проверка участия и версия состава участников одним запросом
+    members_version = await db_versions.get_members_version(chat_id, current_user_id)
+    if members_version is None:
+        raise web.HTTPForbidden(text="Вы не участник этого чата")
 
+    etag = make_etag(current_user_id, chat_id, response_format(request), members_version)
+    check_not_modified(request, etag)
+
+    async with engine.connect() as conn:
         # Получение участников чата
         result = await conn.execute(
             select(
@@ -324,7 +379,7 @@ async def get_chat_members(request: web.Request):
                 "last_seen": row.last_seen.isoformat() if row.last_seen else None
             })
 
-    return web.json_response({"members": members})
+    return render(request, {"members": members}, headers=etag_headers(etag))
 
 
 @docs(tags=["chats"], summary="Удалить участника из чата (только для админов)")
@@ -348,12 +403,15 @@ async def remove_chat_member(request: web.Request):
             raise web.HTTPForbidden(reason="Вы не админ этого чата")
 
         # Удаление участника
-        await conn.execute(
+        result = await conn.execute(
             ChatMembers.delete().where(
                 (ChatMembers.c.chat_id == chat_id) &
                 (ChatMembers.c.user_id == target_user_id)
             )
         )
+        if result.rowcount:
+            await conn.execute(db_versions.bump_members_version(chat_id))
+            await db_sync.record_membership_events(conn, chat_id, [target_user_id], "left")
 
     return web.json_response({"message": "Пользователь удалён"})
 
@@ -361,53 +419,120 @@ async def remove_chat_member(request: web.Request):
 @docs(
     tags=["Messages"],
     summary="Отправка индивидуально зашифрованных сообщений участникам чата (включая себя)",
-    description="Каждому участнику (включая себя) отправляется своя копия зашифрованного сообщения"
+    description=(
+        "Каждому участнику (включая себя) отправляется своя копия зашифрованного сообщения. "
+        "Вместо массива можно передать объект EncryptedGroupMessageSchema (схема — в POST /chats/{chat_id}/send/group): "
+        "один AES-GCM шифртекст и по обёрнутому RSA ключу на участника — шифртекст тогда хранится один раз на всю группу. "
+        "Подписывается не текст сообщения, а хранимые данные: payload_hash (SHA-256 шифртекста в hex), "
+        "в гибридном формате — payload_hash;receiver_id:sha256(wrapped_key);... по возрастанию receiver_id"
+    )
 )
 @request_schema(EncryptedBroadcastListSchema)
 async def send_chat_message(request: web.Request):
     sender_id = await get_current_user_id(request)
     chat_id = int(request.match_info["chat_id"])
-    messages = await request.json()
-
-    if not isinstance(messages, list) or not messages:
-        raise web.HTTPBadRequest(text="Ожидается массив сообщений")
+    body = await request.json()
+
+    hybrid = isinstance(body, dict)
+    if hybrid:
+        body = load_body(EncryptedGroupMessageSchema(unknown=EXCLUDE), body)
+        if not body["keys"]:
+            raise web.HTTPBadRequest(text="Ожидается непустой список keys")
+        # Гибридный формат: разворачиваем в те же сообщения на получателя, но с общим шифртекстом
+        messages = [
+            {
+                "receiver_id": key["receiver_id"],
+                "encrypted_message": body["ciphertext"],
+                "wrapped_key": key["wrapped_key"],
+                "signature": body["signature"],
+            }
+            for key in body["keys"]
+        ]
+    elif isinstance(body, list) and body:
+        messages = load_body(EncryptedPerUserSchema(many=True, unknown=EXCLUDE), body)
+    else:
+        raise web.HTTPBadRequest(text="Ожидается массив сообщений или объект EncryptedGroupMessageSchema")
 
     async with engine.connect() as conn:
+        # Имя отправителя — некоррелированным подзапросом (вычисляется один раз) для WebSocket-событий
         result = await conn.execute(
-            select(ChatMembers.c.user_id)
+            select(
+                ChatMembers.c.user_id,
+                select(Users.c.username).where(Users.c.user_id == sender_id).scalar_subquery().label("sender_username"),
+            )
             .where(ChatMembers.c.chat_id == chat_id)
         )
-        valid_receivers = {row.user_id for row in result.fetchall()}
-
-    last_block = await db_chain.get_last_block()
-    prev_hash = last_block.block_hash if last_block else "0" * 64
-    nonce = randint(100000, 999999)
-    block_id, _ = await db_chain.create_block(prev_hash, nonce, creator_user_id=sender_id)
-
-    tx_ids = []
-
+        rows = result.fetchall()
+        valid_receivers = {row.user_id for row in rows}
+        sender_username = rows[0].sender_username if rows else None
+
+    sender_key = None
+    if signature_verifier.enabled:
+        sender_key = await db_users.get_user_key(sender_id)
+        if sender_key is None:
+            if signature_verifier.mode == "strict":
+                raise web.HTTPBadRequest(text="У отправителя нет публичного ключа для проверки подписи")
+            logger.warning("Подписи пользователя %s не проверены: нет публичного ключа", sender_id)
+
+    transactions = []
+    # Подписи на проверку: (подписанная строка, подпись, ключ) и индексы транзакций, которые она покрывает
+    signed_items = []
+    signed_txs = []
+    payloads = {}
     for msg in messages:
         receiver_id = msg["receiver_id"]
         encrypted = msg["encrypted_message"]
-        signature = msg["signature"]
 
         if receiver_id not in valid_receivers:
             continue
 
-        payload = calculate_hash({"data": encrypted})
-
-        tx_id = await db_chain.add_transaction(
-            block_id=block_id,
-            sender_id=sender_id,
-            receiver_id=receiver_id,
-            chat_id=chat_id,
-            payload_hash=payload,
-            signature=signature
-        )
-        await db_chain.store_encrypted_payload(tx_id, encrypted)
-        tx_ids.append(tx_id)
-
-    await notify_message(chat_id, sender_id)
+        # В гибридном формате шифртекст общий — декодируем и хешируем его один раз
+        payload = payloads.get(encrypted)
+        if payload is None:
+            data = decode_b64_field(encrypted, "encrypted_message")
+            payload = payloads[encrypted] = (data, hash_payload_bytes(data))
+        encrypted_data, payload_hash = payload
+        wrapped_key = msg.get("wrapped_key")
+
+        transactions.append({
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "chat_id": chat_id,
+            "payload_hash": payload_hash,
+            "signature": decode_b64_field(msg["signature"], "signature"),
+            "encrypted_data": encrypted_data,
+            "wrapped_key": None if wrapped_key is None else decode_b64_field(wrapped_key, "wrapped_key"),
+        })
+        if sender_key is not None and not hybrid:
+            # В массиве у каждого получателя своя подпись своего шифртекста, обёрнутых ключей нет
+            signed_items.append((signed_content(payload_hash), msg["signature"], sender_key.public_key))
+            signed_txs.append([len(transactions) - 1])
+
+    if sender_key is not None and hybrid and transactions:
+        # Одна подпись на всё сообщение: шифртекст и обёрнутые ключи всех получателей из запроса
+        wrapped_keys = {key["receiver_id"]: decode_b64_field(key["wrapped_key"], "wrapped_key") for key in body["keys"]}
+        signed_items.append((signed_content(transactions[0]["payload_hash"], wrapped_keys), body["signature"], sender_key.public_key))
+        signed_txs.append(list(range(len(transactions))))
+
+    if signed_items and signature_verifier.mode == "strict":
+        verdicts = await signature_verifier.verify(signed_items)
+        invalid = [transactions[i]["receiver_id"] for txs, ok in zip(signed_txs, verdicts) if not ok for i in txs]
+        if invalid:
+            raise web.HTTPBadRequest(text=f"Неверная подпись сообщений для получателей: {invalid}")
+
+    tx_ids, sealed_at = await block_producer.submit(chat_id, transactions) if transactions else ([], None)
+
+    if signed_items and signature_verifier.mode == "audit":
+        signature_verifier.audit([[tx_ids[i] for i in txs] for txs in signed_txs], signed_items)
+
+    if tx_ids and message_cache.enabled:
+        await append_to_message_cache(chat_id, tx_ids)
+
+    # Участники уже известны, а сообщения для полных событий — на руках: без запросов в БД
+    await notify_message(
+        chat_id, sender_id, _pushed_messages(sender_id, sender_username, transactions, tx_ids, sealed_at),
+        member_ids=list(valid_receivers)
+    )
     await notify_chat_updated(chat_id, exclude_user_id=None)
 
     return web.json_response({
@@ -418,89 +543,252 @@ async def send_chat_message(request: web.Request):
 
 @docs(
     tags=["Messages"],
-    summary="Получить все сообщения чата (зашифрованные)",
-    description="По одному сообщению из каждого блока, включает username, подпись и зашифрованный текст"
+    summary="Отправка сообщения в гибридном формате: один шифртекст на всех участников",
+    description=(
+        "То же, что POST /chats/{chat_id}/send с телом-объектом: один AES-GCM шифртекст и по обёрнутому "
+        "RSA ключу на участника. Отдельный маршрут нужен, чтобы в документации была схема этого тела"
+    )
+)
+@request_schema(EncryptedGroupMessageSchema)
+async def send_chat_group_message(request: web.Request):
+    if not isinstance(await request.json(), dict):
+        raise web.HTTPBadRequest(text="Ожидается объект EncryptedGroupMessageSchema")
+    return await send_chat_message(request)
+
+
+@docs(
+    tags=["Messages"],
+    summary="Отметить сообщения чата прочитанными",
+    description="Сдвигает маркер прочтения до message_id (без него — до последнего сообщения) и пересчитывает число непрочитанных"
+)
+@request_schema(ChatReadSchema)
+@response_schema(ChatReadResponseSchema, 200)
+async def mark_chat_read(request: web.Request):
+    user_id = await get_current_user_id(request)
+    chat_id = int(request.match_info["chat_id"])
+    try:
+        data = await request.json() if request.can_read_body else {}
+    except ValueError:
+        raise web.HTTPBadRequest(text="Тело запроса не является JSON")
+    message_id = load_body(ChatReadSchema(unknown=EXCLUDE), data)["message_id"]
+
+    try:
+        state = await db_messages.mark_chat_read(chat_id, user_id, message_id)
+    except ValueError as e:
+        raise web.HTTPNotFound(text=str(e))
+    if state is None:
+        raise web.HTTPForbidden(text="Вы не состоите в этом чате")
+
+    return web.json_response({
+        "last_read_message_id": state.last_read_transaction_id,
+        "unread_count": state.unread_count,
+    })
+
+
+def _pushed_messages(
+    sender_id: int, sender_username: str | None, transactions: list[dict], tx_ids: list[int], sealed_at: datetime | None
+) -> dict[int, dict]:
+    """
+    Сообщение для WebSocket-событий ?events=full по тому же правилу, что и в ленте:
+    каждому получателю — его копия, отправителю без своей копии — первая транзакция.
+    Поля и timestamp (записанный при запечатывании блока) — как в истории чата.
+    """
+    if not tx_ids:
+        return {}
+    timestamp = sealed_at.isoformat()
+
+    def item(tx: dict, tx_id: int) -> dict:
+        return {
+            "message_id": tx_id,
+            "from_user_id": sender_id,
+            "from_username": sender_username,
+            "encrypted_data": tx["encrypted_data"],
+            "wrapped_key": tx["wrapped_key"],
+            "signature": tx["signature"],
+            "timestamp": timestamp,
+        }
+
+    messages = {}
+    for tx, tx_id in zip(transactions, tx_ids):
+        if tx["receiver_id"] not in messages:
+            messages[tx["receiver_id"]] = item(tx, tx_id)
+    if sender_id not in messages:
+        messages[sender_id] = item(transactions[0], tx_ids[0])
+    return messages
+
+
+async def append_to_message_cache(chat_id: int, tx_ids: list[int]):
+    """Дописывает только что запечатанные сообщения в закэшированные хвосты участников чата."""
+    if not message_cache.has_chat(chat_id):
+        # Хвостов нет, но заполнения, начатые до коммита, должны быть отброшены
+        message_cache.invalidate_chat(chat_id)
+        return
+    try:
+        rows = await db_messages.get_inbox_entries(chat_id, tx_ids)
+    except Exception:
+        logger.exception("Не удалось дописать сообщения чата %s в кэш", chat_id)
+        message_cache.invalidate_chat(chat_id)
+        return
+    message_cache.append(chat_id, [(row.user_id, row.seq, _chat_message_item(row)) for row in rows])
+
+
+def _chat_message_item(row) -> dict:
+    return {
+        "message_id": row.transaction_id,
+        "from_user_id": row.sender_id,
+        "from_username": row.username,
+        "encrypted_data": row.encrypted_data,
+        "wrapped_key": row.wrapped_key,
+        "signature": row.signature,
+        "timestamp": row.timestamp.isoformat()
+    }
+
+
+@docs(
+    tags=["Messages"],
+    summary="Получить сообщения чата (зашифрованные) постранично",
+    description=(
+        "По одной транзакции на каждое сообщение, включает username, подпись и зашифрованный текст. "
+        "Без курсора возвращается последняя страница; before=<next_cursor> — более старые сообщения, "
+        "after=<курсор> — более новые. Сообщения на странице идут по возрастанию времени. "
+        "stream=true — вся история после after (или с начала) потоком, без limit. "
+        "Поддерживает If-None-Match: 304, если в чате не было новых сообщений"
+    ),
+    parameters=[
+        {"in": "query", "name": "limit", "schema": {"type": "integer", "default": DEFAULT_PAGE_SIZE, "maximum": MAX_PAGE_SIZE}},
+        {"in": "query", "name": "before", "schema": {"type": "string"}, "description": "Курсор: сообщения старше него"},
+        {"in": "query", "name": "after", "schema": {"type": "string"}, "description": "Курсор: сообщения новее него"},
+        {"in": "query", "name": "stream", "schema": {"type": "boolean"}, "description": "Потоковая выгрузка истории"},
+    ]
 )
 @response_schema(ChatMessageListSchema, 200)
 async def get_chat_messages(request: web.Request):
     user_id = await get_current_user_id(request)
     chat_id = int(request.match_info["chat_id"])
 
+    try:
+        limit, direction, cursor = parse_page_params(request.query)
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+    # Проверка участия в чате и версия ленты пользователя одним запросом
+    version = await db_versions.get_messages_version(chat_id, user_id)
+    if version is None:
+        raise web.HTTPForbidden(text="Вы не состоите в этом чате")
+
+    etag = make_etag(
+        user_id, chat_id, request.query_string, response_format(request), version.members_version, version.last_seq
+    )
+    check_not_modified(request, etag)
+
     async with engine.connect() as conn:
-        # Проверка участия в чате
-        result = await conn.execute(
-            select(ChatMembers).where(
-                (ChatMembers.c.chat_id == chat_id) &
-                (ChatMembers.c.user_id == user_id)
+        if wants_stream(request):
+            # Вся история после курсора after (или с начала) потоком, без limit
+            after = cursor if direction == "after" else None
+            result = await conn.stream(
+                db_messages.select_chat_messages_page(chat_id, user_id, None, "after", after)
+                .execution_options(yield_per=STREAM_CHUNK_SIZE)
             )
-        )
-        if not result.fetchone():
-            raise web.HTTPForbidden(text="Вы не состоите в этом чате")
+            return await stream_json_list(request, "messages", result, _chat_message_item, headers=etag_headers(etag))
 
-        # Транзакции по чату, где пользователь участник
-        tx_result = await conn.execute(
-            select(
-                BlockchainTransactions.c.transaction_id,
-                BlockchainTransactions.c.sender_id,
-                BlockchainTransactions.c.signature,
-                BlockchainTransactions.c.timestamp,
-                BlockchainPayloads.c.encrypted_data,
-                Users.c.username
-            )
-            .select_from(
-                BlockchainTransactions
-                .join(BlockchainPayloads, BlockchainTransactions.c.transaction_id == BlockchainPayloads.c.transaction_id)
-                .join(Users, BlockchainTransactions.c.sender_id == Users.c.user_id)
+        cached = None
+        if message_cache.enabled:
+            async def load_tail(size: int):
+                rows = (await conn.execute(db_messages.select_chat_messages_page(chat_id, user_id, size))).fetchall()
+                return [(row.seq, _chat_message_item(row)) for row in rows[:size]], len(rows) <= size
+
+            cached = await message_cache.get_page(
+                chat_id, user_id, limit, direction, cursor, load_tail, last_seq=version.last_seq
             )
-            .where(
-                (BlockchainTransactions.c.chat_id == chat_id) &
-                (
-                    (BlockchainTransactions.c.receiver_id == user_id) |
-                    (BlockchainTransactions.c.sender_id == user_id)
-                )
+
+        if cached is not None:
+            messages, bounds, has_more = cached
+        else:
+            # Keyset-пагинация по seq инбокса пользователя, по одной транзакции на сообщение
+            tx_result = await conn.execute(
+                db_messages.select_chat_messages_page(chat_id, user_id, limit, direction, cursor)
             )
-            .order_by(BlockchainTransactions.c.timestamp.asc())
-        )
+            tx_list = tx_result.fetchall()
+            has_more = len(tx_list) > limit
+            tx_list = tx_list[:limit]
+            if direction == "before":
+                tx_list.reverse()
 
-        tx_list = tx_result.fetchall()
+            messages = [_chat_message_item(row) for row in tx_list]
+            bounds = (tx_list[0].seq, tx_list[-1].seq) if tx_list else None
+
+    # Курсор на границу страницы в направлении листания: before — самая старая строка, after — самая новая
+    next_cursor = None
+    if bounds:
+        next_cursor = encode_cursor(bounds[0] if direction == "before" else bounds[1])
+
+    return render(
+        request,
+        {"messages": messages, "next_cursor": next_cursor, "has_more": has_more},
+        headers=etag_headers(etag),
+    )
 
-        # Группировка по block_id
-        all_tx_result = await conn.execute(
-            select(
-                BlockchainTransactions.c.transaction_id,
-                BlockchainTransactions.c.block_id,
-                BlockchainTransactions.c.sender_id,
-                BlockchainTransactions.c.receiver_id
-            ).where(BlockchainTransactions.c.chat_id == chat_id)
-        )
-        all_tx_by_block = {}
-        for tx in all_tx_result.fetchall():
-            all_tx_by_block.setdefault(tx.block_id, []).append(tx)
-
-        # Уникальные сообщения: по одной транзакции с приоритетом входящей
-        selected_tx_ids = set()
-        for block_id, group in all_tx_by_block.items():
-            preferred = next((tx for tx in group if tx.receiver_id == user_id), group[0])
-            selected_tx_ids.add(preferred.transaction_id)
-
-        # Формирование ответа
-        messages = []
-        for row in tx_list:
-            if row.transaction_id not in selected_tx_ids:
-                continue
-            messages.append({
-                "message_id": row.transaction_id,
-                "from_user_id": row.sender_id,
-                "from_username": row.username,
-                "encrypted_data": row.encrypted_data,
-                "signature": row.signature,
-                "timestamp": row.timestamp.isoformat()
-            })
 
-    return web.json_response({"messages": messages})
 
 
 
+@docs(
+    tags=["Messages"],
+    summary="Статистика кэша последних сообщений (только для админов)",
+    description="Попадания, промахи, вытеснения и занятый объём кэша в этом процессе"
+)
+async def get_message_cache_stats(request: web.Request):
+    user_id = await get_current_user_id(request)
+    if not await db_users.is_admin(user_id):
+        raise web.HTTPForbidden(text="Only admin can view cache metrics")
+    return web.json_response(message_cache.stats())
+
+
+SYNC_LIMIT = 500  # записей каждого вида за один ответ /sync
+
+
+@docs(
+    tags=["Messages"],
+    summary="Изменения с момента sync-токена: новые сообщения во всех чатах и события участия",
+    description=(
+        "Без token возвращается только текущий токен (история загружается обычным образом). "
+        "С token — всё новое после него, по возрастанию; has_more=true — повторить запрос с новым токеном"
+    ),
+    parameters=[{"in": "query", "name": "token", "schema": {"type": "string"}}]
+)
+@response_schema(SyncResponseSchema, 200)
+async def sync_changes(request: web.Request):
+    user_id = await get_current_user_id(request)
+    token = request.query.get("token")
+
+    if not token:
+        seq, event_id = await db_sync.get_sync_position(user_id)
+        return render(request, {
+            "messages": [], "membership": [], "sync_token": encode_sync_token(seq, event_id), "has_more": False
+        })
+
+    try:
+        seq, event_id = decode_sync_token(token)
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+    messages, events = await db_sync.get_changes_since(user_id, seq, event_id, SYNC_LIMIT)
+    has_more = len(messages) > SYNC_LIMIT or len(events) > SYNC_LIMIT
+    messages, events = messages[:SYNC_LIMIT], events[:SYNC_LIMIT]
+    if messages:
+        seq = messages[-1].seq
+    if events:
+        event_id = events[-1].event_id
+
+    return render(request, {
+        "messages": [{**_chat_message_item(row), "chat_id": row.chat_id} for row in messages],
+        "membership": [
+            {"chat_id": row.chat_id, "event": row.event_type, "timestamp": row.created_at.isoformat()}
+            for row in events
+        ],
+        "sync_token": encode_sync_token(seq, event_id),
+        "has_more": has_more,
+    })
 
 
 def setup_chat_routes(app: web.Application):
@@ -511,6 +799,10 @@ def setup_chat_routes(app: web.Application):
     app.router.add_get("/chats/{chat_id}/members", get_chat_members, allow_head=False)
     app.router.add_delete("/chats/{chat_id}/members/{user_id}", remove_chat_member)
     app.router.add_post("/chats/{chat_id}/send", send_chat_message)
+    app.router.add_post("/chats/{chat_id}/send/group", send_chat_group_message)
     app.router.add_get("/chats/{chat_id}/messages", get_chat_messages, allow_head=False)
+    app.router.add_post("/chats/{chat_id}/read", mark_chat_read)
+    app.router.add_get("/sync", sync_changes, allow_head=False)
+    app.router.add_get("/metrics/message-cache", get_message_cache_stats, allow_head=False)
 
 
@@ -7,11 +7,12 @@ from app.database import users as db_users
 from app.utils.auth import get_jwt_payload, decode_access_token
 from app.utils.password import hash_password
 from app.utils.locks import get_user_lock
+from app.utils.message_cache import message_cache
 
 from app.schemas.users import CreateUserSchema, UpdateUserSchema, UserResponseSchema, UserLastSeenSchema
 
 # потом убрать и сделать отдельный файл с бд
-from sqlalchemy import select, insert, func, or_
+from sqlalchemy import select, or_
 from app.database.db import engine
 from app.database.models import Users
 
@@ -128,7 +129,10 @@ async def update_user(request: web.Request):
 
     lock = get_user_lock(user_id)
     async with lock:
-        await db_users.update_user(user_id, values)
+        renamed_chat_ids = await db_users.update_user(user_id, values)
+        # В кэше сообщений хранится имя отправителя
+        for chat_id in renamed_chat_ids:
+            message_cache.invalidate_chat(chat_id)
 
         is_admin_now = await db_users.is_admin(user_id)
         if data["is_admin"] and not is_admin_now:
@@ -3,16 +3,32 @@ from app.database.db import engine
 from app.database.models import ChatMembers
 from sqlalchemy import select
 from app.utils.auth import get_user_from_token, get_jwt_payload
+from app.utils.responses import packb, encode_json
 import json
+import msgpack
 from datetime import datetime
 
 
 ONLINE_USERS: dict[int, web.WebSocketResponse] = {}
 
 
+async def send_event(ws: web.WebSocketResponse, payload: dict):
+    """
+    Событие в формате соединения: ?format=msgpack — бинарные кадры MessagePack,
+    иначе JSON (bytes — base64).
+    """
+    if ws.get("format") == "msgpack":
+        await ws.send_bytes(packb(payload))
+    else:
+        await ws.send_str(encode_json(payload).decode())
+
+
 async def websocket_handler(request: web.Request):
     ws = web.WebSocketResponse(autoping=True)
     await ws.prepare(request)
+    ws["format"] = "msgpack" if request.query.get("format") == "msgpack" else "json"
+    # ?events=full — событие message сразу содержит сообщение для этого пользователя
+    ws["events"] = "full" if request.query.get("events") == "full" else "light"
 
     token = request.query.get("token")
     payload = None
@@ -35,12 +51,12 @@ async def websocket_handler(request: web.Request):
 
     try:
         async for msg in ws:
-            if msg.type == WSMsgType.TEXT:
+            if msg.type in (WSMsgType.TEXT, WSMsgType.BINARY):
                 # только ping/pong для keepalive
                 try:
-                    data = json.loads(msg.data)
+                    data = json.loads(msg.data) if msg.type == WSMsgType.TEXT else msgpack.unpackb(msg.data)
                     if data.get("type") == "ping":
-                        await ws.send_json({"type": "pong"})
+                        await send_event(ws, {"type": "pong"})
                 except Exception:
                     pass
             elif msg.type == WSMsgType.ERROR:
@@ -66,16 +82,28 @@ async def notify_chat_updated(chat_id: int, exclude_user_id: int | None = None):
             continue
         ws = ONLINE_USERS.get(uid)
         if ws and not ws.closed:
-            await ws.send_json(payload)
-
-
-async def notify_message(chat_id: int, from_user_id: int):
-    """Лёгкое событие: просто сигнал «в чате есть новое сообщение»."""
-    async with engine.connect() as conn:
-        members = await conn.execute(
-            select(ChatMembers.c.user_id).where(ChatMembers.c.chat_id == chat_id)
-        )
-        members = [row.user_id for row in members.fetchall()]
+            await send_event(ws, payload)
+
+
+async def notify_message(
+    chat_id: int,
+    from_user_id: int,
+    messages: dict[int, dict] | None = None,
+    member_ids: list[int] | None = None,
+):
+    """
+    Лёгкое событие: просто сигнал «в чате есть новое сообщение».
+
+    Соединения с ?events=full получают в поле message ещё и своё сообщение
+    (messages[user_id] — в формате ленты чата), и перечитывать ленту им не нужно.
+    member_ids — участники, если вызывающий их уже знает (тогда без запроса в БД).
+    """
+    if member_ids is None:
+        async with engine.connect() as conn:
+            members = await conn.execute(
+                select(ChatMembers.c.user_id).where(ChatMembers.c.chat_id == chat_id)
+            )
+            member_ids = [row.user_id for row in members.fetchall()]
 
     payload = {
         "type": "message",
@@ -84,10 +112,11 @@ async def notify_message(chat_id: int, from_user_id: int):
         "ts": datetime.utcnow().isoformat(),
     }
 
-    for uid in members:
+    for uid in member_ids:
         ws = ONLINE_USERS.get(uid)
         if ws and not ws.closed:
-            await ws.send_json(payload)
+            message = messages.get(uid) if messages and ws.get("events") == "full" else None
+            await send_event(ws, payload if message is None else {**payload, "message": message})
 
 
 def setup_websocket_routes(app: web.Application):
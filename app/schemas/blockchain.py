@@ -0,0 +1,42 @@
+from marshmallow import Schema, fields
+
+
+class MerkleProofStepSchema(Schema):
+    position = fields.Str(required=True, description="С какой стороны стоит соседний узел: left | right")
+    hash = fields.Str(required=True, description="Хеш соседнего узла (hex)")
+
+
+class MerkleProofResponseSchema(Schema):
+    transaction_id = fields.Int(required=True)
+    block_id = fields.Int(required=True)
+    block_hash = fields.Str(required=True, description="SHA-256 от закодированного block_header")
+    block_header = fields.Dict(required=True, description="Хешируемые поля блока, включая merkle_root")
+    hash_version = fields.Int(required=True, description="0 — JSON (sort_keys, default=str), 1 — бинарное кодирование")
+    payload_hash = fields.Str(required=True, description="Лист дерева — payload_hash транзакции")
+    leaf_index = fields.Int(required=True)
+    proof = fields.List(fields.Nested(MerkleProofStepSchema), required=True)
+
+
+class ChainProblemSchema(Schema):
+    block_id = fields.Int(required=True)
+    problem = fields.Str(required=True)
+
+
+class ChainVerificationReportSchema(Schema):
+    chat_id = fields.Int(allow_none=True, description="Проверенная цепочка чата; null — все блоки")
+    from_block_id = fields.Int(required=True, description="Checkpoint, с которого началась проверка")
+    last_block_id = fields.Int(required=True, description="Последний проверенный блок")
+    checkpoint_block_id = fields.Int(required=True, description="Новый checkpoint: не дальше блока перед первым нарушением или свежим пропуском в block_id")
+    blocks_checked = fields.Int(required=True)
+    problems_count = fields.Int(required=True)
+    problems = fields.List(fields.Nested(ChainProblemSchema), required=True)
+
+
+class ChainVerificationStatusSchema(Schema):
+    status = fields.Str(required=True, description="idle | running | done | failed")
+    full = fields.Bool(required=True)
+    chat_id = fields.Int(allow_none=True)
+    started_at = fields.Str(allow_none=True)
+    finished_at = fields.Str(allow_none=True)
+    error = fields.Str(allow_none=True)
+    report = fields.Nested(ChainVerificationReportSchema, allow_none=True, description="Отчёт последней завершённой проверки")
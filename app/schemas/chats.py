@@ -25,12 +25,23 @@ class ChatResponseSchema(Schema):
     description = fields.Str()
     created_at = fields.DateTime()
     last_message_time = fields.Str(allow_none=True)
+    unread_count = fields.Int(description="Непрочитанных сообщений (только в списке чатов)")
+    last_read_message_id = fields.Int(allow_none=True, description="Последнее прочитанное сообщение (только в списке чатов)")
 
 
 class ChatListSchema(Schema):
     chats = fields.List(fields.Nested(ChatResponseSchema))
 
 
+class ChatReadSchema(Schema):
+    message_id = fields.Int(missing=None, allow_none=True, strict=True, description="До какого сообщения прочитано; без него — до последнего")
+
+
+class ChatReadResponseSchema(Schema):
+    last_read_message_id = fields.Int(allow_none=True)
+    unread_count = fields.Int(required=True)
+
+
 class ChatAddMemberSchema(Schema):
     user_id = fields.Int(required=True)
 
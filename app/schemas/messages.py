@@ -26,7 +26,7 @@ class InboxResponseSchema(Schema):
 class EncryptedPerUserSchema(Schema):
     receiver_id = fields.Int(required=True)
     encrypted_message = fields.String(required=True)
-    signature = fields.String(required=True)
+    signature = fields.String(required=True, description="Подпись отправителя (base64) строки payload_hash — SHA-256 шифртекста в hex")
 
 
 class EncryptedBroadcastListSchema(Schema):
@@ -34,14 +34,48 @@ class EncryptedBroadcastListSchema(Schema):
     __schema_items__ = fields.Nested(EncryptedPerUserSchema)
 
 
+class WrappedKeySchema(Schema):
+    receiver_id = fields.Int(required=True)
+    wrapped_key = fields.String(required=True, description="AES-ключ сообщения, зашифрованный RSA-OAEP получателя (base64)")
+
+
+class EncryptedGroupMessageSchema(Schema):
+    ciphertext = fields.String(required=True, description="Сообщение, зашифрованное AES-256-GCM: nonce || шифртекст || тег (base64)")
+    signature = fields.String(
+        required=True,
+        description="Подпись отправителя (base64) строки payload_hash;receiver_id:sha256(wrapped_key);... по всем keys"
+    )
+    keys = fields.List(fields.Nested(WrappedKeySchema), required=True, description="Обёрнутый ключ для каждого получателя (включая себя)")
+
+
 class ChatMessageSchema(Schema):
     message_id = fields.Int(required=True, description="ID транзакции (сообщения)")
     from_user_id = fields.Int(required=True, description="ID отправителя")
     from_username = fields.Str(required=True, description="Имя пользователя отправителя")
-    encrypted_data = fields.String(required=True, description="Зашифрованное сообщение (base64)")
-    signature = fields.String(required=True, description="Подпись сообщения (base64)")
+    encrypted_data = fields.String(required=True, description="Зашифрованное сообщение (base64; в MessagePack — bin)")
+    wrapped_key = fields.String(allow_none=True, description="AES-ключ для получателя (base64; в MessagePack — bin); null — encrypted_data зашифрован RSA целиком")
+    signature = fields.String(required=True, description="Подпись сообщения (base64; в MessagePack — bin)")
     timestamp = fields.String(required=True, description="Дата и время отправки")
 
 
 class ChatMessageListSchema(Schema):
     messages = fields.List(fields.Nested(ChatMessageSchema), required=True)
+    next_cursor = fields.String(allow_none=True, description="Курсор для следующей страницы в том же направлении (before/after)")
+    has_more = fields.Boolean(required=True, description="Есть ли ещё сообщения в этом направлении")
+
+
+class SyncMessageSchema(ChatMessageSchema):
+    chat_id = fields.Int(required=True, description="ID чата")
+
+
+class MembershipEventSchema(Schema):
+    chat_id = fields.Int(required=True)
+    event = fields.Str(required=True, description="joined | left")
+    timestamp = fields.String(required=True)
+
+
+class SyncResponseSchema(Schema):
+    messages = fields.List(fields.Nested(SyncMessageSchema), required=True)
+    membership = fields.List(fields.Nested(MembershipEventSchema), required=True)
+    sync_token = fields.String(required=True, description="Передать в следующий запрос /sync")
+    has_more = fields.Boolean(required=True, description="Есть ещё изменения — повторить запрос с новым токеном")
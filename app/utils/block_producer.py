@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from datetime import datetime
+from random import randint
+
+from app.config import settings
+from app.database import blockchain as db_chain
+
+logger = logging.getLogger(__name__)
+
+
+class BlockProducer:
+    """
+    Mempool + фоновая задача, которая запечатывает накопленные сообщения в один блок.
+
+    Блок создаётся раз в interval секунд либо сразу, как только в mempool набралось
+    max_transactions транзакций (аналог group commit). Цепочку дописывает только эта
+    задача, поэтому параллельные отправки больше не соревнуются за голову цепочки.
+
+    В режиме per_chat у каждого чата своя цепочка: за один проход запечатывается
+    по блоку на каждый чат с новыми сообщениями, и цепочки дописываются параллельно.
+
+    Если блок не записался, пачка делится пополам, пока ошибку не получит только
+    сломанная отправка, — остальные отправители из той же пачки её не видят.
+    """
+
+    def __init__(self, interval: float, max_transactions: int, per_chat: bool = False):
+        self.interval = interval
+        self.max_transactions = max_transactions
+        self.per_chat = per_chat
+        self._pending: list[tuple[int | None, list[dict], asyncio.Future]] = []
+        self._pending_transactions = 0
+        self._wakeup = asyncio.Event()
+        self._seal_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Отменяем задачу только между запечатываниями, чтобы не оборвать запись блока
+            async with self._seal_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Дописываем то, что осталось в mempool
+        await self._seal()
+
+    async def submit(self, chat_id: int, transactions: list[dict]) -> tuple[list[int], datetime]:
+        """
+        Ставит сообщение в mempool и ждёт запечатывания блока.
+        Возвращает ID транзакций и их timestamp, записанный в БД.
+        """
+        future = asyncio.get_running_loop().create_future()
+        chain_key = chat_id if self.per_chat else None
+        self._pending.append((chain_key, transactions, future))
+        self._pending_transactions += len(transactions)
+
+        if not self.running:
+            await self._seal()
+        elif self._pending_transactions >= self.max_transactions:
+            self._wakeup.set()
+
+        # shield: отмена HTTP-запроса не должна ломать запечатывание блока
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._seal()
+
+    async def _seal(self):
+        async with self._seal_lock:
+            if not self._pending:
+                return
+
+            batch = self._pending
+            self._pending = []
+            self._pending_transactions = 0
+
+            chains: dict[int | None, list[tuple[list[dict], asyncio.Future]]] = {}
+            for chain_key, transactions, future in batch:
+                chains.setdefault(chain_key, []).append((transactions, future))
+
+            await asyncio.gather(*[
+                self._seal_chain(chain_key, entries) for chain_key, entries in chains.items()
+            ])
+
+    async def _seal_chain(self, chat_id: int | None, entries: list[tuple[list[dict], asyncio.Future]]):
+        try:
+            _, _, tx_ids, sealed_at = await db_chain.create_block_with_transactions(
+                randint(100000, 999999),
+                creator_user_id=None,
+                messages=[transactions for transactions, _ in entries],
+                chat_id=chat_id,
+            )
+        except Exception as e:
+            if len(entries) == 1:
+                logger.exception("Не удалось запечатать блок")
+                _, future = entries[0]
+                if not future.done():
+                    future.set_exception(e)
+                return
+            logger.warning("Не удалось запечатать блок из %s отправок, делим пачку: %s", len(entries), e)
+        else:
+            for (_, future), ids in zip(entries, tx_ids):
+                if not future.done():
+                    future.set_result((ids, sealed_at))
+            return
+
+        # Ошибка одной отправки не должна валить остальные: делим пачку пополам
+        # и запечатываем половины по очереди — цепочка дописывается последовательно
+        middle = len(entries) // 2
+        await self._seal_chain(chat_id, entries[:middle])
+        await self._seal_chain(chat_id, entries[middle:])
+
+
+block_producer = BlockProducer(
+    interval=settings.BLOCK_INTERVAL_MS / 1000,
+    max_transactions=settings.BLOCK_MAX_TRANSACTIONS,
+    per_chat=settings.PER_CHAT_CHAINS,
+)
@@ -1,21 +1,165 @@
 # app/utils/blockchain.py
 
+import os
 import json
 import hashlib
+import struct
+import threading
+from collections import OrderedDict
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 from base64 import b64encode, b64decode
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # ------------------------------
 # Хеширование блока
 # ------------------------------
 
+# Версии кодирования, по которым считаются block_hash и payload_hash блока
+HASH_VERSION_LEGACY_JSON = 0  # json.dumps(sort_keys=True, default=str), блоки до перехода на v1
+HASH_VERSION_BINARY = 1
+CURRENT_HASH_VERSION = HASH_VERSION_BINARY
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Флаги необязательных полей заголовка в бинарном кодировании
+_HAS_CREATOR = 0x01
+_HAS_CHAT = 0x02
+_HAS_MERKLE_ROOT = 0x04
+
+
 def calculate_hash(block_data: dict) -> str:
     block_string = json.dumps(block_data, sort_keys=True, default=str).encode()
     return hashlib.sha256(block_string).hexdigest()
 
+
+def encode_block_header(block_data: dict) -> bytes:
+    """
+    Каноническое бинарное кодирование заголовка блока (версия 1), big-endian:
+
+        version: u8 | previous_hash: 32 байта | timestamp: i64 (мкс от эпохи, UTC)
+        | nonce: i64 | flags: u8 | [creator_user_id: i64] | [chat_id: i64] | [merkle_root: 32 байта]
+
+    Необязательные поля присутствуют, только если выставлен их бит во flags.
+    """
+    creator_user_id = block_data.get("creator_user_id")
+    chat_id = block_data.get("chat_id")
+    root = block_data.get("merkle_root")
+
+    flags = (
+        (_HAS_CREATOR if creator_user_id is not None else 0)
+        | (_HAS_CHAT if chat_id is not None else 0)
+        | (_HAS_MERKLE_ROOT if root is not None else 0)
+    )
+    timestamp_us = (block_data["timestamp"] - _EPOCH) // _ONE_MICROSECOND
+
+    parts = [
+        struct.pack(
+            ">B32sqqB",
+            HASH_VERSION_BINARY,
+            bytes.fromhex(block_data["previous_hash"]),
+            timestamp_us,
+            block_data["nonce"],
+            flags,
+        )
+    ]
+    if creator_user_id is not None:
+        parts.append(struct.pack(">q", creator_user_id))
+    if chat_id is not None:
+        parts.append(struct.pack(">q", chat_id))
+    if root is not None:
+        parts.append(bytes.fromhex(root))
+    return b"".join(parts)
+
+
+def hash_block(block_data: dict, version: int = CURRENT_HASH_VERSION) -> str:
+    if version == HASH_VERSION_LEGACY_JSON:
+        return calculate_hash(block_data)
+    return hashlib.sha256(encode_block_header(block_data)).hexdigest()
+
+
+def hash_payload(encrypted_b64: str, version: int = CURRENT_HASH_VERSION) -> str:
+    """payload_hash зашифрованного сообщения: v1 — SHA-256 от сырых байт шифртекста."""
+    if version == HASH_VERSION_LEGACY_JSON:
+        return calculate_hash({"data": encrypted_b64})
+    return hash_payload_bytes(b64decode(encrypted_b64))
+
+
+def hash_payload_bytes(encrypted: bytes) -> str:
+    """То же, что hash_payload версии 1, для уже декодированного шифртекста."""
+    return hashlib.sha256(encrypted).hexdigest()
+
+
+def payload_matches(encrypted: bytes, payload_hash: str) -> bool:
+    """Соответствует ли шифртекст payload_hash — в текущей (v1) или старой JSON-версии хеша."""
+    if hash_payload_bytes(encrypted) == payload_hash:
+        return True
+    return calculate_hash({"data": b64encode(encrypted).decode()}) == payload_hash
+
+
+def to_b64(data: bytes | None) -> str | None:
+    """Сырые байты из bytea-колонки -> base64 для JSON-ответа."""
+    return None if data is None else b64encode(data).decode()
+
+# ------------------------------
+# Merkle-дерево над payload_hash транзакций блока
+# ------------------------------
+
+# Префиксы листьев и узлов (как в RFC 6962), чтобы лист нельзя было выдать за узел
+MERKLE_LEAF_PREFIX = b"\x00"
+MERKLE_NODE_PREFIX = b"\x01"
+
+
+def _merkle_leaf(payload_hash: str) -> bytes:
+    return hashlib.sha256(MERKLE_LEAF_PREFIX + bytes.fromhex(payload_hash)).digest()
+
+
+def _merkle_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(MERKLE_NODE_PREFIX + left + right).digest()
+
+
+def _merkle_levels(payload_hashes: list[str]) -> list[list[bytes]]:
+    levels = [[_merkle_leaf(h) for h in payload_hashes]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        # Непарный последний узел поднимается на уровень выше без изменений
+        levels.append([
+            _merkle_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ])
+    return levels
+
+
+def merkle_root(payload_hashes: list[str]) -> str:
+    if not payload_hashes:
+        return hashlib.sha256(b"").hexdigest()
+    return _merkle_levels(payload_hashes)[-1][0].hex()
+
+
+def merkle_proof(payload_hashes: list[str], index: int) -> list[dict]:
+    """Путь от листа index до корня: список {"position": "left"|"right", "hash": hex}."""
+    proof = []
+    for level in _merkle_levels(payload_hashes)[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({
+                "position": "left" if sibling < index else "right",
+                "hash": level[sibling].hex(),
+            })
+        index //= 2
+    return proof
+
+
+def verify_merkle_proof(payload_hash: str, proof: list[dict], root: str) -> bool:
+    node = _merkle_leaf(payload_hash)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = _merkle_node(sibling, node) if step["position"] == "left" else _merkle_node(node, sibling)
+    return node.hex() == root
+
 # ------------------------------
 # Генерация ключей (только для теста)
 # ------------------------------
@@ -38,12 +182,80 @@ def generate_key_pair():
 
     return priv_pem.decode(), pub_pem.decode()
 
+# ------------------------------
+# Кэш распарсенных ключей
+# ------------------------------
+
+KEY_CACHE_SIZE = 1024
+
+
+class KeyCache:
+    """
+    Ограниченный LRU-кэш распарсенных PEM-ключей.
+
+    Ключ кэша — SHA-256 от PEM, так что сам PEM в кэше не хранится. Разбор PEM
+    заметно дороже самой операции шифрования/проверки, а одни и те же ключи
+    используются тысячи раз подряд.
+    """
+
+    def __init__(self, maxsize: int = KEY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._keys: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, pem: str, loader):
+        cache_key = (kind, hashlib.sha256(pem.encode()).digest())
+        with self._lock:
+            key = self._keys.get(cache_key)
+            if key is not None:
+                self._keys.move_to_end(cache_key)
+                self.hits += 1
+                return key
+            self.misses += 1
+
+        key = loader(pem.encode())
+
+        with self._lock:
+            self._keys[cache_key] = key
+            self._keys.move_to_end(cache_key)
+            while len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+        return key
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._keys), "maxsize": self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self.hits = self.misses = 0
+
+
+key_cache = KeyCache()
+
+
+def load_public_key(public_pem: str):
+    return key_cache.get(
+        "public", public_pem,
+        lambda data: serialization.load_pem_public_key(data, backend=default_backend())
+    )
+
+
+def load_private_key(private_pem: str):
+    return key_cache.get(
+        "private", private_pem,
+        lambda data: serialization.load_pem_private_key(data, password=None, backend=default_backend())
+    )
+
 # ------------------------------
 # Шифрование сообщения (E2E)
 # ------------------------------
 
 def encrypt_message(message: str, recipient_public_pem: str) -> str:
-    public_key = serialization.load_pem_public_key(recipient_public_pem.encode(), backend=default_backend())
+    public_key = load_public_key(recipient_public_pem)
     encrypted = public_key.encrypt(
         message.encode(),
         padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
@@ -55,19 +267,83 @@ def encrypt_message(message: str, recipient_public_pem: str) -> str:
 # ------------------------------
 
 def decrypt_message(encrypted_b64: str, recipient_private_pem: str) -> str:
-    private_key = serialization.load_pem_private_key(recipient_private_pem.encode(), password=None, backend=default_backend())
+    private_key = load_private_key(recipient_private_pem)
     decrypted = private_key.decrypt(
         b64decode(encrypted_b64),
         padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
     )
     return decrypted.decode()
 
+# ------------------------------
+# Гибридное шифрование для групп: один AES-GCM шифртекст + ключ, обёрнутый RSA, на получателя
+# ------------------------------
+
+CONTENT_KEY_SIZE = 32  # AES-256
+GCM_NONCE_SIZE = 12
+
+_OAEP = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+
+
+def wrap_key(content_key: bytes, recipient_public_pem: str) -> str:
+    return b64encode(load_public_key(recipient_public_pem).encrypt(content_key, _OAEP)).decode()
+
+
+def unwrap_key(wrapped_key_b64: str, recipient_private_pem: str) -> bytes:
+    return load_private_key(recipient_private_pem).decrypt(b64decode(wrapped_key_b64), _OAEP)
+
+
+def encrypt_hybrid(message: str, recipient_public_pems: dict[int, str]) -> tuple[str, dict[int, str]]:
+    """
+    Шифрует сообщение один раз случайным AES-256-GCM ключом и оборачивает ключ
+    RSA-OAEP для каждого получателя. Размер сообщения не ограничен размером RSA-ключа.
+
+    Возвращает (ciphertext_b64, {receiver_id: wrapped_key_b64}), где
+    ciphertext = nonce (12 байт) || шифртекст || тег GCM.
+    """
+    content_key = AESGCM.generate_key(bit_length=CONTENT_KEY_SIZE * 8)
+    nonce = os.urandom(GCM_NONCE_SIZE)
+    ciphertext = nonce + AESGCM(content_key).encrypt(nonce, message.encode(), None)
+    wrapped_keys = {
+        receiver_id: wrap_key(content_key, public_pem)
+        for receiver_id, public_pem in recipient_public_pems.items()
+    }
+    return b64encode(ciphertext).decode(), wrapped_keys
+
+
+def decrypt_hybrid(ciphertext_b64: str, wrapped_key_b64: str, recipient_private_pem: str) -> str:
+    content_key = unwrap_key(wrapped_key_b64, recipient_private_pem)
+    data = b64decode(ciphertext_b64)
+    return AESGCM(content_key).decrypt(data[:GCM_NONCE_SIZE], data[GCM_NONCE_SIZE:], None).decode()
+
+
+def decrypt_any(encrypted_b64: str, wrapped_key_b64: str | None, recipient_private_pem: str) -> str:
+    """Расшифровка сообщения любого формата: без wrapped_key — старый, целиком в RSA."""
+    if wrapped_key_b64 is None:
+        return decrypt_message(encrypted_b64, recipient_private_pem)
+    return decrypt_hybrid(encrypted_b64, wrapped_key_b64, recipient_private_pem)
+
 # ------------------------------
 # Подпись сообщения
 # ------------------------------
 
+def signed_content(payload_hash: str, wrapped_keys: dict[int, bytes] | None = None) -> str:
+    """
+    Строка, которую подписывает отправитель: payload_hash шифртекста, а в гибридном
+    формате ещё и SHA-256 обёрнутых ключей по receiver_id. Всё это хранится в
+    транзакциях, поэтому подпись проверяется без исходного текста сообщения:
+
+        <payload_hash>[;<receiver_id>:<sha256(wrapped_key)>...]  (по возрастанию receiver_id)
+    """
+    if not wrapped_keys:
+        return payload_hash
+    keys = ";".join(
+        f"{receiver_id}:{hash_payload_bytes(wrapped_keys[receiver_id])}" for receiver_id in sorted(wrapped_keys)
+    )
+    return f"{payload_hash};{keys}"
+
+
 def sign_message(message: str, sender_private_pem: str) -> str:
-    private_key = serialization.load_pem_private_key(sender_private_pem.encode(), password=None, backend=default_backend())
+    private_key = load_private_key(sender_private_pem)
     signature = private_key.sign(
         message.encode(),
         padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
@@ -80,7 +356,7 @@ def sign_message(message: str, sender_private_pem: str) -> str:
 # ------------------------------
 
 def verify_signature(message: str, signature_b64: str, sender_public_pem: str) -> bool:
-    public_key = serialization.load_pem_public_key(sender_public_pem.encode(), backend=default_backend())
+    public_key = load_public_key(sender_public_pem)
     try:
         public_key.verify(
             b64decode(signature_b64),
@@ -96,10 +372,38 @@ def verify_signature(message: str, signature_b64: str, sender_public_pem: str) -
 # Сборка данных блока
 # ------------------------------
 
-def generate_block_data(previous_hash: str, transactions: list, nonce: int) -> dict:
-    return {
+def generate_block_data(
+    previous_hash: str,
+    nonce: int,
+    creator_user_id: int | None,
+    chat_id: int | None = None,
+    merkle_root: str | None = None,
+) -> dict:
+    block_data = {
         "previous_hash": previous_hash,
-        "transactions": transactions,
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.utcnow(),
         "nonce": nonce,
+        "creator_user_id": creator_user_id,
+    }
+    # chat_id и merkle_root входят в хеш, только если заданы,
+    # поэтому хеши старых блоков пересчитываются как раньше
+    if chat_id is not None:
+        block_data["chat_id"] = chat_id
+    if merkle_root is not None:
+        block_data["merkle_root"] = merkle_root
+    return block_data
+
+
+def block_header(block) -> dict:
+    """Данные блока из БД в том виде, в каком они хешировались при его создании."""
+    header = {
+        "previous_hash": block.previous_hash,
+        "timestamp": block.timestamp,
+        "nonce": block.nonce,
+        "creator_user_id": block.creator_user_id,
     }
+    if block.chat_id is not None:
+        header["chat_id"] = block.chat_id
+    if block.merkle_root is not None:
+        header["merkle_root"] = block.merkle_root
+    return header
@@ -0,0 +1,282 @@
+"""
+Проверка целостности цепочки блоков.
+
+Блоки и их транзакции читаются батчами (keyset-пагинация по block_id), хеши
+пересчитываются в пуле процессов, а после каждого батча сохраняется checkpoint —
+повторный запуск проверяет только новые блоки, прерванный запуск продолжается
+с места остановки. Checkpoint не заходит за первый блок с нарушением: пока
+блок не исправлен, каждый инкрементальный запуск сообщает о нём снова.
+
+В режиме PER_CHAT_CHAINS блоки разных чатов коммитятся параллельно, и block_id
+с меньшим номером может появиться позже большего. Поэтому общий checkpoint
+останавливается перед пропуском в block_id, если блок после пропуска свежее
+CHECKPOINT_GAP_GRACE: пропуск либо ещё не закоммичен, либо остался от отката —
+тогда спустя это время его перестают ждать. Внутри одной цепочки блоки
+коммитятся по порядку (под её lock'ом), поэтому проверке с chat_id это не нужно.
+
+Кроме хешей блоков и Merkle-корней проверяется, что encrypted_data каждого
+payload'а соответствует его payload_hash. С chat_id проверяется только цепочка одного чата (режим
+PER_CHAT_CHAINS): читаются лишь её блоки, checkpoint у неё свой.
+
+    python -m app.utils.chain_verifier [--full] [--chat-id 42] [--batch-size 5000] [--workers 8]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from app.database import blockchain as db_chain
+from app.database.db import engine
+from app.utils.blockchain import block_header, hash_block, merkle_root, payload_matches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_REPORTED_PROBLEMS = 1000
+# Дольше этого транзакция с блоком не живёт: более старый пропуск в block_id — откат
+CHECKPOINT_GAP_GRACE = timedelta(minutes=10)
+
+
+def verify_blocks(blocks: list[tuple]) -> list[dict]:
+    """
+    Выполняется в процессе пула: пересчитывает хеши блоков, их Merkle-корни и
+    хеши шифртекстов. Блоки с hash_version=0 проверяются по старому JSON-кодированию.
+    """
+    problems = []
+    for block_id, header, hash_version, block_hash, payload_hashes, payloads in blocks:
+        if hash_block(header, hash_version) != block_hash:
+            problems.append({"block_id": block_id, "problem": "block_hash не совпадает с содержимым блока"})
+        root = header.get("merkle_root")
+        if root is not None and merkle_root(payload_hashes) != root:
+            problems.append({"block_id": block_id, "problem": "merkle_root не совпадает с транзакциями блока"})
+        for payload_hash, encrypted_data in payloads:
+            if encrypted_data is None:
+                problems.append({"block_id": block_id, "problem": f"payload {payload_hash} не найден"})
+            elif not payload_matches(encrypted_data, payload_hash):
+                problems.append({"block_id": block_id, "problem": f"encrypted_data не совпадает с payload_hash {payload_hash}"})
+    return problems
+
+
+def last_block_before_gap(blocks: list, after_block_id: int, cutoff: datetime) -> int | None:
+    """
+    block_id, дальше которого общий checkpoint двигать нельзя: последний блок перед
+    первым пропуском в нумерации, за которым идёт блок новее cutoff. None — пропусков нет.
+    """
+    previous = after_block_id
+    for block in blocks:
+        if block.block_id != previous + 1 and block.timestamp > cutoff:
+            return previous
+        previous = block.block_id
+    return None
+
+
+def checkpoint_name(chat_id: int | None) -> str:
+    return "default" if chat_id is None else f"chat:{chat_id}"
+
+
+async def _fetch_batch(after_block_id: int, batch_size: int, chat_id: int | None):
+    blocks = await db_chain.get_blocks_after(after_block_id, batch_size, chat_id)
+    payload_hashes = await db_chain.get_payload_hashes_for_blocks(
+        [block.block_id for block in blocks if block.merkle_root is not None]
+    )
+    payloads = await db_chain.get_payloads_for_blocks([block.block_id for block in blocks])
+    return blocks, payload_hashes, payloads
+
+
+async def verify_chain(
+    full: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int | None = None,
+    chat_id: int | None = None,
+) -> dict:
+    workers = workers or os.cpu_count() or 1
+    checkpoint = checkpoint_name(chat_id)
+    start_block_id = 0 if full else await db_chain.get_verifier_checkpoint(checkpoint)
+    last_block_id = start_block_id
+    checkpoint_block_id = start_block_id
+    checkpoint_frozen = False
+    gap_cutoff = datetime.utcnow() - CHECKPOINT_GAP_GRACE
+    last_hashes: dict[int | None, str] = {}
+    problems = []
+    problems_count = 0
+    blocks_checked = 0
+
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Следующий батч читается из БД, пока пул считает хеши текущего
+        next_batch = asyncio.create_task(_fetch_batch(last_block_id, batch_size, chat_id))
+        while True:
+            blocks, payload_hashes, payloads = await next_batch
+            if not blocks:
+                break
+            batch_start_id = last_block_id
+            next_batch = asyncio.create_task(_fetch_batch(blocks[-1].block_id, batch_size, chat_id))
+
+            batch_problems = []
+
+            # Связность previous_hash проверяется последовательно, внутри каждой цепочки
+            unknown_chains = list({block.chat_id for block in blocks} - last_hashes.keys())
+            if unknown_chains:
+                last_hashes.update(await db_chain.get_chain_hashes_before(unknown_chains, blocks[0].block_id))
+            for block in blocks:
+                if block.previous_hash != last_hashes[block.chat_id]:
+                    batch_problems.append({"block_id": block.block_id, "problem": "previous_hash не указывает на предыдущий блок цепочки"})
+                last_hashes[block.chat_id] = block.block_hash
+
+            items = [
+                (
+                    block.block_id,
+                    block_header(block),
+                    block.hash_version,
+                    block.block_hash,
+                    payload_hashes.get(block.block_id, []),
+                    payloads.get(block.block_id, []),
+                )
+                for block in blocks
+            ]
+            chunk_size = -(-len(items) // workers)
+            results = await asyncio.gather(*[
+                loop.run_in_executor(pool, verify_blocks, items[i:i + chunk_size])
+                for i in range(0, len(items), chunk_size)
+            ])
+            for result in results:
+                batch_problems.extend(result)
+
+            problems_count += len(batch_problems)
+            problems.extend(batch_problems[:MAX_REPORTED_PROBLEMS - len(problems)])
+            blocks_checked += len(blocks)
+            last_block_id = blocks[-1].block_id
+
+            if not checkpoint_frozen:
+                # Дальше первого нарушения или незакрытого пропуска checkpoint не двигается,
+                # проверка же идёт до конца
+                stops = [min(p["block_id"] for p in batch_problems) - 1] if batch_problems else []
+                if chat_id is None:
+                    gap = last_block_before_gap(blocks, batch_start_id, gap_cutoff)
+                    if gap is not None:
+                        stops.append(gap)
+                if stops:
+                    checkpoint_block_id = min(stops)
+                    checkpoint_frozen = True
+                else:
+                    checkpoint_block_id = last_block_id
+                await db_chain.save_verifier_checkpoint(checkpoint_block_id, checkpoint)
+
+    return {
+        "chat_id": chat_id,
+        "from_block_id": start_block_id,
+        "last_block_id": last_block_id,
+        "checkpoint_block_id": checkpoint_block_id,
+        "blocks_checked": blocks_checked,
+        "problems_count": problems_count,
+        "problems": sorted(problems, key=lambda p: p["block_id"]),
+    }
+
+
+class VerificationRunner:
+    """
+    Проверка цепочки в фоновой задаче для админского эндпоинта: запрос только
+    запускает её, результат забирается отдельно. Одновременно — не больше одной.
+    """
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self.full = False
+        self.chat_id: int | None = None
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self.report: dict | None = None
+        self.error: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, full: bool = False, chat_id: int | None = None) -> bool:
+        """False — проверка уже выполняется."""
+        if self.running:
+            return False
+        self.full = full
+        self.chat_id = chat_id
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        self.report = None
+        self.error = None
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        try:
+            self.report = await verify_chain(full=self.full, chat_id=self.chat_id)
+            if self.report["problems_count"]:
+                logger.warning("Проверка цепочки: найдено нарушений %s", self.report["problems_count"])
+        except asyncio.CancelledError:
+            self.error = "Проверка прервана"
+            raise
+        except Exception as e:
+            logger.exception("Проверка цепочки завершилась ошибкой")
+            self.error = str(e)
+        finally:
+            self.finished_at = datetime.utcnow()
+
+    def status(self) -> dict:
+        if self._task is None:
+            state = "idle"
+        elif self.running:
+            state = "running"
+        else:
+            state = "failed" if self.error else "done"
+        return {
+            "status": state,
+            "full": self.full,
+            "chat_id": self.chat_id,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+            "report": self.report,
+        }
+
+
+verification_runner = VerificationRunner()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Проверка целостности цепочки блоков")
+    parser.add_argument("--full", action="store_true", help="проверить всю цепочку, игнорируя checkpoint")
+    parser.add_argument("--chat-id", type=int, default=None, help="проверить только цепочку этого чата")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    args = parser.parse_args()
+
+    engine.sync_engine.echo = False
+
+    try:
+        report = await verify_chain(
+            full=args.full, batch_size=args.batch_size, workers=args.workers, chat_id=args.chat_id
+        )
+    finally:
+        await engine.dispose()
+
+    print(f"Проверены блоки {report['from_block_id'] + 1}..{report['last_block_id']}: {report['blocks_checked']} шт.")
+    print(f"Checkpoint: {report['checkpoint_block_id']}")
+    if not report["problems_count"]:
+        print("✅ Нарушений не найдено")
+        return
+
+    print(f"❌ Найдено нарушений: {report['problems_count']}")
+    for problem in report["problems"]:
+        print(f"  block_id={problem['block_id']}: {problem['problem']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
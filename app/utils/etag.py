@@ -0,0 +1,25 @@
+import hashlib
+
+from aiohttp import web
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из версий ресурса: хеш от их строкового представления."""
+    digest = hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_headers(etag: str) -> dict:
+    # no-cache: клиент может хранить ответ, но обязан перепроверять его по ETag.
+    # Vary: ответы с ETag согласуют формат (JSON / MessagePack) по Accept
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+
+
+def check_not_modified(request: web.Request, etag: str):
+    """304 Not Modified, если If-None-Match совпадает с текущим ETag (или равен *)."""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    if "*" in candidates or etag in candidates:
+        raise web.HTTPNotModified(headers=etag_headers(etag))
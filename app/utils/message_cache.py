@@ -0,0 +1,223 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import count
+
+from app.config import settings
+
+# Примерные накладные расходы на одно сообщение сверх длины строк и байтов (dict, ключи, int)
+ENTRY_OVERHEAD = 200
+
+
+def entry_size(item: dict) -> int:
+    return ENTRY_OVERHEAD + sum(len(value) for value in item.values() if isinstance(value, (str, bytes)))
+
+
+class ChatTail:
+    """Последние сообщения чата глазами одного пользователя, по возрастанию seq."""
+
+    __slots__ = ("seqs", "items", "size", "complete")
+
+    def __init__(self):
+        self.seqs: list[int] = []
+        self.items: list[dict] = []
+        self.size = 0
+        # True — в хвосте вся история пользователя, в базе старше ничего нет
+        self.complete = False
+
+    def insert(self, seq: int, item: dict) -> int:
+        pos = bisect_left(self.seqs, seq)
+        if pos < len(self.seqs) and self.seqs[pos] == seq:
+            return 0
+        self.seqs.insert(pos, seq)
+        self.items.insert(pos, item)
+        size = entry_size(item)
+        self.size += size
+        return size
+
+    def trim(self, keep: int) -> int:
+        extra = len(self.seqs) - keep
+        if extra <= 0:
+            return 0
+        freed = sum(entry_size(item) for item in self.items[:extra])
+        del self.seqs[:extra]
+        del self.items[:extra]
+        self.size -= freed
+        self.complete = False
+        return freed
+
+
+class MessageCache:
+    """
+    Ограниченный LRU-кэш последних сообщений чатов по ключу (chat_id, user_id).
+
+    Для каждого пользователя хранится не больше per_chat последних записей его
+    инбокса (seq + готовый элемент ответа, бинарные поля — bytes). Общий размер ограничен max_bytes,
+    вытесняются давно не читавшиеся пары (chat_id, user_id). После отправки новые
+    записи дописываются в хвосты всех закэшированных участников (append), поэтому
+    повторные запросы после события message обслуживаются из памяти.
+
+    Заполнение из базы (store) отбрасывается, если за время запроса чат изменился:
+    для этого у каждого чата есть версия, которая растёт при append/invalidate_chat.
+
+    Кэш живёт в процессе: при нескольких процессах приложения каждый дописывает только
+    свои отправки. Чужие отправки замечаются по last_seq из базы при чтении (хвост
+    перечитывается), а смена имён и участников — нет, поэтому держать кэш включённым
+    имеет смысл в одном процессе.
+    """
+
+    def __init__(self, max_bytes: int, per_chat: int):
+        self.max_bytes = max_bytes
+        self.per_chat = per_chat
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._tails: OrderedDict[tuple[int, int], ChatTail] = OrderedDict()
+        self._viewers: dict[int, set[int]] = {}
+        self._versions: dict[int, int] = {}
+        self._counter = count(1)
+        self._epoch = 0  # растёт при clear(), чтобы отбросить все заполнения в процессе
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.per_chat > 0
+
+    def version(self, chat_id: int) -> tuple[int, int]:
+        return self._epoch, self._versions.get(chat_id, 0)
+
+    def has_chat(self, chat_id: int) -> bool:
+        return bool(self._viewers.get(chat_id))
+
+    async def get_page(
+        self, chat_id: int, user_id: int, limit: int, direction: str, cursor: int | None, load_tail,
+        last_seq: int | None = None,
+    ):
+        """
+        Страница из кэша в порядке возрастания seq: (items, boundary_seqs, has_more)
+        или None, если хвоста не хватает для ответа — тогда страницу читают из базы.
+        boundary_seqs — seq первой и последней записи страницы (для курсора).
+
+        Если хвоста пользователя нет, а запрошены последние сообщения или более
+        новые, чем cursor, хвост читается через load_tail(per_chat) -> (entries, complete).
+        Листание вглубь истории (before=cursor) кэш не заполняет.
+
+        last_seq — последний seq инбокса по базе (из него строится ETag). Хвост, который
+        до него не дотягивает (отправка из другого процесса), устарел и читается заново.
+        """
+        key = (chat_id, user_id)
+        tail = self._tails.get(key)
+        if tail is not None and last_seq is not None and (not tail.seqs or tail.seqs[-1] < last_seq):
+            self._drop(key)
+
+        if key not in self._tails:
+            self.misses += 1
+            if direction == "before" and cursor is not None:
+                return None
+            version = self.version(chat_id)
+            entries, complete = await load_tail(self.per_chat)
+            self.store(chat_id, user_id, version, entries, complete)
+            return self._slice(key, limit, direction, cursor)
+
+        page = self._slice(key, limit, direction, cursor)
+        if page is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return page
+
+    def _slice(self, key: tuple[int, int], limit: int, direction: str, cursor: int | None):
+        tail = self._tails.get(key)
+        if tail is None:
+            return None
+
+        if direction == "after":
+            # Все записи новее cursor есть в хвосте, если он начинается не позже cursor
+            if not tail.complete and (cursor is None or not tail.seqs or tail.seqs[0] > cursor):
+                return None
+            start = 0 if cursor is None else bisect_right(tail.seqs, cursor)
+            end = min(start + limit, len(tail.seqs))
+            has_more = end < len(tail.seqs)
+        else:
+            end = len(tail.seqs) if cursor is None else bisect_left(tail.seqs, cursor)
+            if end < limit and not tail.complete:
+                return None
+            start = max(0, end - limit)
+            has_more = start > 0 or not tail.complete
+
+        self._tails.move_to_end(key)
+        items = tail.items[start:end]
+        bounds = (tail.seqs[start], tail.seqs[end - 1]) if items else None
+        return items, bounds, has_more
+
+    def store(self, chat_id: int, user_id: int, version: tuple[int, int], entries: list[tuple[int, dict]], complete: bool):
+        """Сохраняет хвост, прочитанный из базы; version — self.version(chat_id) до запроса."""
+        if not self.enabled or self.version(chat_id) != version:
+            return
+        self._drop((chat_id, user_id))
+
+        tail = ChatTail()
+        for seq, item in entries:
+            tail.insert(seq, item)
+        tail.complete = complete
+        tail.trim(self.per_chat)
+
+        self._tails[(chat_id, user_id)] = tail
+        self._viewers.setdefault(chat_id, set()).add(user_id)
+        self.size += tail.size
+        self._evict()
+
+    def append(self, chat_id: int, entries: list[tuple[int, int, dict]]):
+        """Дописывает новые записи инбокса (user_id, seq, item) в закэшированные хвосты."""
+        self._versions[chat_id] = next(self._counter)
+        for user_id, seq, item in entries:
+            tail = self._tails.get((chat_id, user_id))
+            if tail is None:
+                continue
+            self.size += tail.insert(seq, item)
+            self.size -= tail.trim(self.per_chat)
+        self._evict()
+
+    def invalidate_chat(self, chat_id: int):
+        self._versions[chat_id] = next(self._counter)
+        for user_id in list(self._viewers.get(chat_id, ())):
+            self._drop((chat_id, user_id))
+
+    def clear(self):
+        self._epoch += 1
+        self._tails.clear()
+        self._viewers.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._tails),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _drop(self, key: tuple[int, int]):
+        tail = self._tails.pop(key, None)
+        if tail is None:
+            return
+        self.size -= tail.size
+        chat_id, user_id = key
+        viewers = self._viewers.get(chat_id)
+        if viewers is not None:
+            viewers.discard(user_id)
+            if not viewers:
+                del self._viewers[chat_id]
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._tails:
+            key = next(iter(self._tails))
+            self._drop(key)
+            self.evictions += 1
+
+
+message_cache = MessageCache(
+    max_bytes=settings.MESSAGE_CACHE_MAX_BYTES,
+    per_chat=settings.MESSAGE_CACHE_MESSAGES,
+)
@@ -0,0 +1,50 @@
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(seq: int) -> str:
+    """Непрозрачный курсор на позицию seq в инбоксе пользователя."""
+    return urlsafe_b64encode(str(seq).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Некорректный курсор")
+
+
+def encode_sync_token(seq: int, event_id: int) -> str:
+    """Токен /sync: позиция в инбоксе пользователя и в его событиях участия."""
+    return urlsafe_b64encode(f"{seq}.{event_id}".encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> tuple[int, int]:
+    try:
+        seq, event_id = urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode().split(".")
+        return int(seq), int(event_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Некорректный sync-токен")
+
+
+def parse_page_params(query) -> tuple[int, str, int | None]:
+    """
+    Параметры keyset-пагинации из query string: limit и один из курсоров before/after.
+    Возвращает (limit, direction, cursor); без курсора — последняя страница (direction="before").
+    """
+    before, after = query.get("before"), query.get("after")
+    if before and after:
+        raise ValueError("Укажите только один из параметров before и after")
+
+    try:
+        limit = int(query.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit должен быть числом")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit должен быть от 1 до {MAX_PAGE_SIZE}")
+
+    if after:
+        return limit, "after", decode_cursor(after)
+    return limit, "before", decode_cursor(before) if before else None
@@ -0,0 +1,49 @@
+"""
+Очистка content-addressed хранилища payload'ов.
+
+Payload хранится один раз на шифртекст, и транзакции ссылаются на него по
+payload_hash. Когда последняя ссылающаяся транзакция удалена (каскадом вместе
+с блоком, чатом или пользователем), payload становится мусором. Скрипт удаляет
+такие payload'ы батчами, не трогая те, к которым обращались недавно.
+
+    python -m app.utils.payload_gc [--grace-minutes 60] [--batch-size 10000]
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+
+from app.database import blockchain as db_chain
+from app.database.db import engine
+
+DEFAULT_GRACE_MINUTES = 60
+DEFAULT_BATCH_SIZE = 10000
+
+
+async def collect_garbage(grace: timedelta = timedelta(minutes=DEFAULT_GRACE_MINUTES), batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    deleted_total = 0
+    while True:
+        deleted = await db_chain.delete_unreferenced_payloads(grace, batch_size)
+        deleted_total += deleted
+        if deleted < batch_size:
+            return deleted_total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Удаление payload'ов без ссылающихся транзакций")
+    parser.add_argument("--grace-minutes", type=int, default=DEFAULT_GRACE_MINUTES,
+                        help="не удалять payload'ы, к которым обращались за последние N минут")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    engine.sync_engine.echo = False
+
+    try:
+        deleted = await collect_garbage(timedelta(minutes=args.grace_minutes), args.batch_size)
+    finally:
+        await engine.dispose()
+
+    print(f"Удалено неиспользуемых payload'ов: {deleted}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+import json
+from base64 import b64encode
+from datetime import date
+
+import msgpack
+from aiohttp import web
+
+from app.config import settings
+
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+JSON_MEDIA_TYPES = {"application/json"}
+
+
+def _json_default(value):
+    # Бинарные поля (шифртекст, подписи, обёрнутые ключи) в JSON уходят base64
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return b64encode(value).decode()
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _msgpack_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not msgpack serializable")
+
+
+def load_json_encoder(name: str):
+    """
+    Кодировщик JSON в bytes по имени из настроек. orjson в разы быстрее stdlib
+    и сам сериализует datetime; auto — orjson, если пакет установлен.
+    """
+    if name not in ("auto", "orjson", "json"):
+        raise ValueError(f"Неизвестный JSON_ENCODER: {name}")
+    if name != "json":
+        try:
+            import orjson
+        except ImportError:
+            if name == "orjson":
+                raise
+        else:
+            return lambda data: orjson.dumps(data, default=_json_default)
+    return lambda data: json.dumps(data, default=_json_default).encode()
+
+
+encode_json = load_json_encoder(settings.JSON_ENCODER)
+
+
+def packb(data) -> bytes:
+    """MessagePack: bytes уходят как bin без base64."""
+    return msgpack.packb(data, use_bin_type=True, default=_msgpack_default)
+
+
+def _accept_quality(accept: str, media_types: set[str]) -> float:
+    """q самого точного диапазона Accept, под который подходит тип: тип > application/* > */*."""
+    best = (-1, 0.0)
+    for part in accept.split(","):
+        media_range, *params = part.split(";")
+        media_range = media_range.strip().lower()
+        if media_range in media_types:
+            specificity = 2
+        elif media_range == "application/*":
+            specificity = 1
+        elif media_range == "*/*":
+            specificity = 0
+        else:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if specificity > best[0]:
+            best = (specificity, quality)
+    return best[1]
+
+
+def response_format(request: web.Request) -> str:
+    """
+    "msgpack", если по Accept клиент предпочитает MessagePack (q выше, чем у JSON),
+    иначе "json" — в том числе при равных q и без заголовка.
+    """
+    accept = request.headers.get("Accept", "")
+    if not accept:
+        return "json"
+    if _accept_quality(accept, MSGPACK_MEDIA_TYPES) > _accept_quality(accept, JSON_MEDIA_TYPES):
+        return "msgpack"
+    return "json"
+
+
+def render(request: web.Request, data, status: int = 200, headers: dict | None = None) -> web.Response:
+    """
+    Ответ в формате, выбранном по Accept: MessagePack для нативных клиентов,
+    JSON по умолчанию. Сериализаторы отдают бинарные поля как bytes — в JSON
+    они превращаются в base64 только здесь.
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if response_format(request) == "msgpack":
+        return web.Response(body=packb(data), status=status, content_type=MSGPACK_CONTENT_TYPE, headers=headers)
+    return web.Response(body=encode_json(data), status=status, content_type="application/json", charset="utf-8", headers=headers)
@@ -0,0 +1,72 @@
+from typing import Callable
+
+from marshmallow import Schema, fields
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _identity(value):
+    return value
+
+
+# Преобразования для dump: то же, что делают поля marshmallow для корректных значений
+_CONVERTERS = {
+    fields.Integer: int,
+    fields.String: str,
+    fields.Boolean: bool,
+    fields.Float: float,
+    fields.DateTime: _isoformat,
+    fields.Date: _isoformat,
+    fields.Raw: _identity,
+}
+
+
+def _converter(field: fields.Field):
+    if isinstance(field, fields.Nested):
+        nested = field.nested
+        if isinstance(nested, Schema):
+            nested = type(nested)
+        if not (isinstance(nested, type) and issubclass(nested, Schema)) or field.only or field.exclude:
+            return None
+        compiled = compile_schema(nested)
+        if field.many:
+            return lambda values: [compiled(value) for value in values]
+        return compiled
+    if isinstance(field, fields.List):
+        inner = _converter(field.inner)
+        if inner is None:
+            return None
+        return lambda values: [None if value is None else inner(value) for value in values]
+    if isinstance(field, fields.DateTime) and field.format not in (None, "iso", "iso8601"):
+        return None
+    # Точный тип: у подклассов (Email, Url, ...) своя логика
+    return _CONVERTERS.get(type(field))
+
+
+def compile_schema(schema_cls: type[Schema]) -> Callable[[dict], dict]:
+    """
+    Заранее собранный сериализатор для dump схемы из dict'ов: список
+    (ключ, преобразование) строится один раз, а не на каждый запрос, как при
+    Schema().dump. Ключи без значения пропускаются, None остаётся None.
+    Если в схеме есть поле, которое так не сериализовать, возвращается dump
+    единственного экземпляра схемы.
+    """
+    schema = schema_cls()
+    steps = []
+    for name, field in schema.dump_fields.items():
+        convert = _converter(field)
+        if convert is None:
+            return schema.dump
+        steps.append((field.attribute or name, field.data_key or name, convert))
+
+    def serialize(obj: dict) -> dict:
+        result = {}
+        for attribute, key, convert in steps:
+            if attribute in obj:
+                value = obj[attribute]
+                result[key] = None if value is None else convert(value)
+        return result
+
+    return serialize
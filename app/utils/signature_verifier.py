@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import settings
+from app.utils.blockchain import verify_signature
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_MODES = ("off", "strict", "audit")
+
+
+def verify_batch(items: list[tuple[str, str, str]]) -> list[bool]:
+    """Выполняется в процессе пула: (message, signature_b64, public_pem) -> подпись верна."""
+    results = {}
+    verdicts = []
+    for item in items:
+        # Клиент обычно подписывает одно сообщение для всех получателей
+        if item not in results:
+            try:
+                results[item] = verify_signature(*item)
+            except Exception:
+                results[item] = False
+        verdicts.append(results[item])
+    return verdicts
+
+
+class SignatureVerifier:
+    """
+    Проверка RSA-PSS подписей в пуле процессов, чтобы не блокировать event loop.
+
+    Режимы: off — не проверять; strict — отклонять отправку с неверной подписью;
+    audit — принимать сразу, проверять в фоне и логировать нарушения.
+    Подписывается signed_content: payload_hash и обёрнутые ключи, то есть то,
+    что хранится в транзакциях. Все подписи одного запроса уходят в пул одной задачей.
+    """
+
+    def __init__(self, mode: str, workers: int):
+        if mode not in SIGNATURE_MODES:
+            raise ValueError(f"SIGNATURE_VERIFICATION должен быть одним из {SIGNATURE_MODES}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: ProcessPoolExecutor | None = None
+        self._audit_tasks: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def start(self):
+        if self.enabled and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def stop(self):
+        if self._audit_tasks:
+            await asyncio.gather(*self._audit_tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def verify(self, items: list[tuple[str, str, str]]) -> list[bool]:
+        if not items:
+            return []
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, verify_batch, items)
+
+    def audit(self, tx_groups: list[list[int]], items: list[tuple[str, str, str]]):
+        """
+        Фоновая проверка уже записанных транзакций; нарушения только логируются.
+        tx_groups[i] — транзакции, которые покрывает подпись items[i].
+        """
+        task = asyncio.create_task(self._audit(tx_groups, items))
+        self._audit_tasks.add(task)
+        task.add_done_callback(self._audit_tasks.discard)
+
+    async def _audit(self, tx_groups: list[list[int]], items: list[tuple[str, str, str]]):
+        try:
+            verdicts = await self.verify(items)
+        except Exception:
+            logger.exception("Не удалось проверить подписи транзакций %s", [tx_id for group in tx_groups for tx_id in group])
+            return
+        invalid = [tx_id for group, ok in zip(tx_groups, verdicts) if not ok for tx_id in group]
+        if invalid:
+            logger.warning("Неверная подпись у транзакций: %s", invalid)
+
+
+signature_verifier = SignatureVerifier(
+    mode=settings.SIGNATURE_VERIFICATION,
+    workers=settings.SIGNATURE_VERIFY_WORKERS,
+)
@@ -0,0 +1,37 @@
+from aiohttp import web
+
+from app.utils.responses import encode_json
+
+STREAM_CHUNK_SIZE = 500  # строк на одно чтение из серверного курсора и одну запись в сокет
+
+
+def wants_stream(request: web.Request) -> bool:
+    return request.query.get("stream", "").lower() in ("1", "true")
+
+
+async def stream_json_list(
+    request: web.Request, key: str, result, serialize,
+    chunk_size: int = STREAM_CHUNK_SIZE, headers: dict | None = None,
+) -> web.StreamResponse:
+    """
+    Отдаёт {"<key>": [...]} по мере чтения строк из AsyncResult (conn.stream):
+    в памяти одновременно не больше chunk_size строк, независимо от размера выборки.
+
+    Поток всегда JSON (bytes — base64): в MessagePack длину массива нужно знать заранее.
+
+    Все проверки доступа должны быть сделаны до вызова: после prepare() статус
+    ответа уже отправлен, и ошибку можно сообщить только обрывом соединения.
+    """
+    response = web.StreamResponse(headers={"Content-Type": "application/json; charset=utf-8", **(headers or {})})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+
+    await response.write(b'{"' + key.encode() + b'": [')
+    separator = b""
+    async for rows in result.partitions(chunk_size):
+        chunk = b",".join(encode_json(serialize(row)) for row in rows)
+        await response.write(separator + chunk)
+        separator = b","
+    await response.write(b"]}")
+    await response.write_eof()
+    return response